@@ -1,9 +1,25 @@
-from flask import Flask, render_template, request, jsonify, url_for, session, redirect
+from flask import Flask, render_template, stream_template, request, jsonify, url_for, session, redirect, g, make_response, abort, send_file, stream_with_context
 import joblib
+import numpy as np
 import requests
-from rapidfuzz import process
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
 from datetime import datetime
-from functools import lru_cache
+from functools import wraps
+import atexit
+import cProfile
+import csv
+import hashlib
+import inspect
+import io
+import json
+import pstats
+import queue
+import random
+import re
+import sqlite3
+import threading
+import zlib
 import time
 import os
 from dotenv import load_dotenv
@@ -13,6 +29,9 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_migrate import Migrate
 import uuid
+import click
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY") or os.urandom(24)
@@ -20,14 +39,282 @@ app.secret_key = os.environ.get("SECRET_KEY") or os.urandom(24)
 
 load_dotenv()
 
+# ------------- Catalog -------------
+
+class Catalog:
+    """
+    Columnar view of the title dataframes holding only the fields we read at
+    runtime (id, title/name, poster_path, release/first-air date).
+    Built once from the pickles with `flask build-catalog` and stored as a
+    plain .npz so the web process never has to import pandas.
+    """
+    def __init__(self, ids, titles, posters, dates, title_key, date_key, popularity=None):
+        self.title_key = title_key
+        self.date_key = date_key
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.popularity = (np.zeros(len(self.ids)) if popularity is None
+                           else np.asarray(popularity, dtype=np.float64))
+        # Plain lists give O(1) row access without numpy scalar boxing
+        self._ids = self.ids.tolist()
+        self.titles = np.asarray(titles).tolist()
+        self._posters = np.asarray(posters).tolist()
+        self._dates = np.asarray(dates).tolist()
+        self._row_by_id = {}
+        self._row_by_title = {}
+        for i, (item_id, title) in enumerate(zip(self._ids, self.titles)):
+            self._row_by_id.setdefault(item_id, i)
+            self._row_by_title.setdefault(title, i)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @classmethod
+    def from_dataframe(cls, df, title_key, date_key):
+        title_column = title_key if title_key in df.columns else "title"
+        df = df.reset_index(drop=True)
+
+        def column(name):
+            if name not in df.columns:
+                return np.full(len(df), "", dtype=str)
+            return df[name].fillna("").astype(str).to_numpy(dtype=str)
+
+        popularity = (df["popularity"].fillna(0).to_numpy(dtype=np.float64)
+                      if "popularity" in df.columns else None)
+        return cls(df["id"].to_numpy(dtype=np.int64), column(title_column),
+                   column("poster_path"), column(date_key), title_key, date_key, popularity)
+
+    @classmethod
+    def load(cls, path, title_key, date_key):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ids"], data["titles"], data["posters"], data["dates"],
+                       title_key, date_key,
+                       data["popularity"] if "popularity" in data.files else None)
+
+    def save(self, path):
+        np.savez_compressed(path, ids=self.ids, titles=np.asarray(self.titles, dtype=str),
+                            posters=np.asarray(self._posters, dtype=str),
+                            dates=np.asarray(self._dates, dtype=str),
+                            popularity=self.popularity)
+
+    def find(self, title):
+        """Row of the first entry with exactly this title, or None"""
+        return self._row_by_title.get(title)
+
+    def index_of(self, item_id):
+        """Row of a TMDB id, or None if it's not in the dataset"""
+        return self._row_by_id.get(int(item_id))
+
+    def top_rows(self, n):
+        """Rows of the n most popular titles (dataset order if no popularity)"""
+        return np.argsort(-self.popularity, kind='stable')[:n].tolist()
+
+    def row(self, i):
+        return {
+            "id": self._ids[i],
+            self.title_key: self.titles[i],
+            "poster_path": self._posters[i] or None,
+            self.date_key: self._dates[i],
+        }
+
+CATALOG_SOURCES = {
+    'movie': ('model/tmdb_movies.pkl', 'model/catalog_movies.npz', 'title', 'release_date'),
+    'tv': ('model/tmdb_tv_series.pkl', 'model/catalog_tv.npz', 'name', 'first_air_date'),
+}
+
+def load_catalog(kind):
+    pickle_path, catalog_path, title_key, date_key = CATALOG_SOURCES[kind]
+    if os.path.exists(catalog_path) and (
+            not os.path.exists(pickle_path)
+            or os.path.getmtime(catalog_path) >= os.path.getmtime(pickle_path)):
+        return Catalog.load(catalog_path, title_key, date_key)
+    # Stale or missing catalog: fall back to the dataframe (imports pandas)
+    print(f"Catalog {catalog_path} missing or stale, loading {pickle_path}; run `flask build-catalog`")
+    return Catalog.from_dataframe(joblib.load(pickle_path), title_key, date_key)
+
+@app.cli.command('build-catalog')
+def build_catalog():
+    """Write the compact runtime catalogs from the dataframe pickles"""
+    for kind, (pickle_path, catalog_path, title_key, date_key) in CATALOG_SOURCES.items():
+        catalog = Catalog.from_dataframe(joblib.load(pickle_path), title_key, date_key)
+        catalog.save(catalog_path)
+        print(f"Wrote {len(catalog)} {kind} rows to {catalog_path}")
+
+SIMILARITY_PATHS = {'movie': 'model/tmdb_similarity.pkl', 'tv': 'model/tmdb_tv_similarity.pkl'}
+
 # Load precomputed data
-movie_df = joblib.load('model/tmdb_movies.pkl')
-movie_similarity = joblib.load('model/tmdb_similarity.pkl')
-tv_df = joblib.load('model/tmdb_tv_series.pkl')
-tv_similarity = joblib.load('model/tmdb_tv_similarity.pkl')
+movie_catalog = load_catalog('movie')
+movie_similarity = joblib.load(SIMILARITY_PATHS['movie'])
+tv_catalog = load_catalog('tv')
+tv_similarity = joblib.load(SIMILARITY_PATHS['tv'])
+
+# ------------- Joint movie/TV neighbours -------------
+
+JOINT_INDEX_PATH = os.environ.get("JOINT_INDEX_PATH", "model/joint_neighbors.npz")
+# Text columns of the model dataframes that make up the shared feature space
+# (alongside the title); whichever of them a dataframe has are used
+JOINT_TEXT_COLUMNS = ('tags', 'overview', 'genres', 'keywords')
+
+def joint_texts(df, title_key):
+    def text(value):
+        if isinstance(value, (list, tuple)):
+            return ' '.join(str(v) for v in value)
+        return '' if value is None or value != value else str(value)
+    columns = [title_key if title_key in df.columns else 'title']
+    columns += [c for c in JOINT_TEXT_COLUMNS if c in df.columns]
+    return [' '.join(parts) for parts in zip(*(df[c].map(text) for c in columns))]
+
+def top_k_neighbors(queries, candidates, k, chunk_rows=1000):
+    """
+    Top-k candidate rows by cosine similarity for every query row, computed
+    chunk_rows queries at a time so the full similarity matrix never exists.
+    Both inputs must already be L2-normalised.
+    """
+    k = min(k, candidates.shape[0])
+    rows = np.zeros((queries.shape[0], k), dtype=np.int32)
+    scores = np.zeros((queries.shape[0], k), dtype=np.float16)
+    for start in range(0, queries.shape[0], chunk_rows):
+        sims = queries[start:start + chunk_rows] @ candidates.T
+        sims = sims.toarray() if hasattr(sims, 'toarray') else np.asarray(sims)
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        rows[start:start + len(top)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(top)] = np.take_along_axis(top_scores, order, axis=1)
+    return rows, scores
+
+class JointIndex:
+    """
+    Precomputed cross-catalog neighbours: for each movie row the closest TV
+    rows and vice versa, stored as (rows, scores) tables aligned with the
+    runtime catalogs.
+    """
+    def __init__(self, tables, catalogs):
+        self.tables = tables
+        self.catalogs = catalogs
+
+    @classmethod
+    def load(cls, path, catalogs):
+        """None when the file is missing or was built from different catalogs"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            for kind, catalog in catalogs.items():
+                if not np.array_equal(data[f"{kind}_ids"], catalog.ids):
+                    print(f"Joint index {path} does not match the {kind} catalog; run `flask build-joint-index`")
+                    return None
+            tables = {
+                ('movie', 'tv'): (data["movie_to_tv"], data["movie_to_tv_scores"]),
+                ('tv', 'movie'): (data["tv_to_movie"], data["tv_to_movie_scores"]),
+            }
+        return cls(tables, catalogs)
+
+    def neighbors(self, kind, item_id, n=6):
+        """Catalog rows of the other kind closest to item_id (empty if unknown)"""
+        row = self.catalogs[kind].index_of(item_id)
+        if row is None:
+            return []
+        other = 'tv' if kind == 'movie' else 'movie'
+        rows, scores = self.tables[(kind, other)]
+        return [self.catalogs[other].row(i)
+                for i, score in zip(rows[row][:n].tolist(), scores[row][:n].tolist()) if score > 0]
+
+@app.cli.command('build-joint-index')
+@click.option('--top-k', default=20, show_default=True, help='Neighbours kept per title.')
+@click.option('--chunk-rows', default=1000, show_default=True, help='Query rows scored at a time.')
+def build_joint_index(top_k, chunk_rows):
+    """Precompute movie<->TV neighbours in one shared TF-IDF space"""
+    # Offline only: scikit-learn is not needed by the web process
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    frames = {kind: joblib.load(pickle_path).reset_index(drop=True)
+              for kind, (pickle_path, _, _, _) in CATALOG_SOURCES.items()}
+    texts = {kind: joint_texts(frames[kind], title_key)
+             for kind, (_, _, title_key, _) in CATALOG_SOURCES.items()}
+    vectorizer = TfidfVectorizer(max_features=20000, stop_words='english')
+    vectorizer.fit(texts['movie'] + texts['tv'])
+    vectors = {kind: vectorizer.transform(texts[kind]) for kind in frames}
+
+    movie_to_tv, movie_to_tv_scores = top_k_neighbors(vectors['movie'], vectors['tv'], top_k, chunk_rows)
+    tv_to_movie, tv_to_movie_scores = top_k_neighbors(vectors['tv'], vectors['movie'], top_k, chunk_rows)
+    np.savez_compressed(
+        JOINT_INDEX_PATH,
+        movie_ids=frames['movie']['id'].to_numpy(dtype=np.int64),
+        tv_ids=frames['tv']['id'].to_numpy(dtype=np.int64),
+        movie_to_tv=movie_to_tv, movie_to_tv_scores=movie_to_tv_scores,
+        tv_to_movie=tv_to_movie, tv_to_movie_scores=tv_to_movie_scores,
+    )
+    print(f"Wrote {top_k} neighbours for {len(movie_to_tv)} movies and {len(tv_to_movie)} TV shows to {JOINT_INDEX_PATH}")
+
+joint_index = JointIndex.load(JOINT_INDEX_PATH, {'movie': movie_catalog, 'tv': tv_catalog})
 
 TMDB_API_KEY = os.getenv('TMDB_API_KEY')
-TMDB_IMAGE_URL = "https://image.tmdb.org/t/p/w500"
+TMDB_API_URL = os.environ.get("TMDB_API_URL", "https://api.themoviedb.org/3")
+TMDB_TIMEOUT = float(os.environ.get("TMDB_TIMEOUT", 10))
+TMDB_RETRY_AFTER_MAX = 60
+
+TMDB_BREAKER_THRESHOLD = int(os.environ.get("TMDB_BREAKER_THRESHOLD", 5))
+TMDB_BREAKER_COOLDOWN = float(os.environ.get("TMDB_BREAKER_COOLDOWN", 30))
+
+class CircuitBreaker:
+    """
+    Counts consecutive upstream failures. After `threshold` of them, calls
+    are refused for `cooldown` seconds so pages fall back to snapshots at
+    once instead of each waiting out TMDB_TIMEOUT. Once the cool-down ends
+    calls go through again; one more failure reopens it, a success resets it.
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return time.monotonic() >= self._open_until
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                if self.allow():
+                    app.logger.warning(f"TMDB failed {self._failures} times in a row, "
+                                       f"skipping it for {self.cooldown:.0f}s")
+                self._open_until = time.monotonic() + self.cooldown
+
+tmdb_breaker = CircuitBreaker(TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_COOLDOWN)
+
+# Monotonic time before which TMDB asked us (429 Retry-After) not to call again
+_tmdb_backoff = {'until': 0.0}
+
+def tmdb_get(url, **kwargs):
+    """
+    requests.get for TMDB calls. Feeds the circuit breaker (and fails fast
+    while it is open) and remembers 429 Retry-After so bulk jobs can back off.
+    """
+    if not tmdb_breaker.allow():
+        raise requests.ConnectionError("TMDB circuit open, not calling")
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.RequestException:
+        tmdb_breaker.failure()
+        raise
+    if response.status_code >= 500:
+        tmdb_breaker.failure()
+    else:
+        tmdb_breaker.success()
+    if response.status_code == 429:
+        try:
+            delay = float(response.headers.get('Retry-After', 1))
+        except ValueError:
+            delay = 1
+        _tmdb_backoff['until'] = max(_tmdb_backoff['until'],
+                                     time.monotonic() + min(delay, TMDB_RETRY_AFTER_MAX))
+    return response
 
 if TMDB_API_KEY:
         print(f"API Key loaded: {TMDB_API_KEY}")
@@ -46,133 +333,813 @@ GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
 
+GOOGLE_DISCOVERY_TTL = int(os.environ.get("GOOGLE_DISCOVERY_TTL", 60 * 60))
+AUTH_TIMEOUT = float(os.environ.get("AUTH_TIMEOUT", 10))
+
 client = WebApplicationClient(GOOGLE_CLIENT_ID)
 
+# Pooled connections for the OAuth flow so login bursts reuse TLS sessions
+auth_session = requests.Session()
+auth_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+_google_provider_cfg = {'value': None, 'expires': 0}
+_google_provider_lock = threading.Lock()
+
+def get_google_provider_cfg():
+    """Google's OpenID discovery document, fetched at most once per TTL"""
+    if _google_provider_cfg['expires'] > time.time():
+        return _google_provider_cfg['value']
+    with _google_provider_lock:
+        # Another thread may have refreshed it while we waited
+        if _google_provider_cfg['expires'] <= time.time():
+            response = auth_session.get(GOOGLE_DISCOVERY_URL, timeout=AUTH_TIMEOUT)
+            response.raise_for_status()
+            _google_provider_cfg.update(value=response.json(), expires=time.time() + GOOGLE_DISCOVERY_TTL)
+        return _google_provider_cfg['value']
+
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
-app.config['SESSION_COOKIE_SECURE'] = True  # For HTTPS
+app.config['SESSION_COOKIE_SECURE'] = os.environ.get('SESSION_COOKIE_SECURE', '1') == '1'  # For HTTPS
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 
+# ------------- TMDB response cache -------------
+
+TMDB_CACHE_URL = os.environ.get("TMDB_CACHE_URL")  # redis://... or a SQLite file path
+TMDB_CACHE_TTL = int(os.environ.get("TMDB_CACHE_TTL", 6 * 60 * 60))
+TMDB_CACHE_MAX_ENTRIES = int(os.environ.get("TMDB_CACHE_MAX_ENTRIES", 50000))
+
+MISSING = object()
+
+class SQLiteCache:
+    """
+    TTL cache in a single SQLite file shared by every worker on the host.
+    Entries are evicted soonest-to-expire first once the table outgrows
+    max_entries. Hit/miss counters are kept in the same file so the reported
+    hit rate covers all workers, not just the current process.
+    """
+    STATS_FLUSH_EVERY = 50
+    EVICT_EVERY = 200
+
+    def __init__(self, path, max_entries=TMDB_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {'hits': 0, 'misses': 0}
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                         "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._pending[name] += 1
+            if sum(self._pending.values()) < self.STATS_FLUSH_EVERY:
+                return
+            pending, self._pending = self._pending, {'hits': 0, 'misses': 0}
+        self._flush_stats(pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {'hits': 0, 'misses': 0}
+        self._flush_stats(pending)
+
+    def _flush_stats(self, pending):
+        if not any(pending.values()):
+            return
+        conn = self._connect()
+        for name, count in pending.items():
+            conn.execute("INSERT INTO stats (name, count) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET count = count + excluded.count",
+                         (name, count))
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            self._count('misses')
+            return MISSING
+        self._count('hits')
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=TMDB_CACHE_TTL):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                     (key, json.dumps(value), time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def evict(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires "
+                     "LIMIT max(0, (SELECT count(*) FROM cache) - ?))", (self.max_entries,))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache")
+        conn.execute("DELETE FROM stats")
+
+    def stats(self):
+        self.flush()
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT name, count FROM stats").fetchall())
+        entries = conn.execute("SELECT count(*) FROM cache WHERE expires > ?", (time.time(),)).fetchone()[0]
+        return {'hits': counts.get('hits', 0), 'misses': counts.get('misses', 0), 'entries': entries}
+
+class RedisCache:
+    """
+    Same interface backed by Redis (or anything speaking its protocol).
+    Size bounds come from the server's maxmemory / allkeys-lru policy.
+    """
+    def __init__(self, url, prefix='tmdb:'):
+        import redis  # optional dependency, only needed for this backend
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.client.incr(self.prefix + 'stats:misses')
+            return MISSING
+        self.client.incr(self.prefix + 'stats:hits')
+        return json.loads(value)
+
+    def set(self, key, value, ttl=TMDB_CACHE_TTL):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def evict(self):
+        pass
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        hits, misses = self.client.mget(self.prefix + 'stats:hits', self.prefix + 'stats:misses')
+        stats_prefix = (self.prefix + 'stats:').encode()
+        entries = sum(1 for key in self.client.scan_iter(match=self.prefix + '*')
+                      if not key.startswith(stats_prefix))
+        return {'hits': int(hits or 0), 'misses': int(misses or 0), 'entries': entries}
+
+def make_tmdb_cache(url):
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url)
+    if not url:
+        os.makedirs(app.instance_path, exist_ok=True)
+        url = os.path.join(app.instance_path, 'tmdb_cache.db')
+    return SQLiteCache(url)
+
+tmdb_cache = make_tmdb_cache(TMDB_CACHE_URL)
+if hasattr(tmdb_cache, 'flush'):
+    atexit.register(tmdb_cache.flush)
+
+def cache_read(key):
+    """tmdb_cache.get that treats a cache outage as a miss"""
+    try:
+        return tmdb_cache.get(key)
+    except Exception as e:
+        app.logger.warning(f"TMDB cache read failed: {e}")
+        return MISSING
+
+def cache_write(key, value, ttl=TMDB_CACHE_TTL):
+    """tmdb_cache.set that logs instead of failing the request"""
+    try:
+        tmdb_cache.set(key, value, ttl)
+    except Exception as e:
+        app.logger.warning(f"TMDB cache write failed: {e}")
+
+class Uncached:
+    """
+    Returned by a tmdb_cached helper whose empty answer is a valid, cacheable
+    result (no trailer, no providers) to hand back `value` on an upstream
+    error without storing it.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value=None):
+        self.value = value
+
+def tmdb_cached(ttl=TMDB_CACHE_TTL, cache_if=bool):
+    """
+    Cache a TMDB helper's JSON-serialisable result in the shared cache.
+    Results failing `cache_if` (by default empty or None, which is what the
+    helpers return on upstream errors) are not stored, and neither are
+    Uncached results.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def make_key(*args, **kwargs):
+            # f(1), f(1, region='IN') and f(movie_id=1) must share one entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return ':'.join([func.__name__] + [str(value) for value in bound.arguments.values()])
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(*args, **kwargs)
+            value = cache_read(key)
+            if value is not MISSING:
+                return value
+            value = func(*args, **kwargs)
+            if isinstance(value, Uncached):
+                return value.value
+            if cache_if(value):
+                cache_write(key, value, ttl)
+            return value
+
+        wrapper.cache_key = make_key
+        wrapper.invalidate = lambda *args, **kwargs: tmdb_cache.delete(make_key(*args, **kwargs))
+        return wrapper
+    return decorator
+
+@app.cli.command('cache-stats')
+def cache_stats():
+    """Show hit rate and size of the shared TMDB cache"""
+    stats = tmdb_cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = stats['hits'] / lookups if lookups else 0
+    print(f"entries={stats['entries']} hits={stats['hits']} misses={stats['misses']} hit_rate={hit_rate:.1%}")
+
+@app.cli.command('cache-clear')
+def cache_clear():
+    """Drop every entry from the shared TMDB cache"""
+    tmdb_cache.clear()
+    print("TMDB cache cleared")
+
+# ------------- Detail snapshots -------------
+
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+# fallback: use snapshots only when TMDB fails; prefer: serve snapshots when
+# present and only call TMDB for titles we don't have; only: never call TMDB
+SNAPSHOT_MODE = os.environ.get("SNAPSHOT_MODE", "fallback")
+
+class SnapshotStore:
+    """
+    Detail bundles for movies, TV shows and people kept in a local SQLite
+    file as zlib-compressed JSON, so detail pages can be served when TMDB
+    is slow or down. Filled in bulk by `flask build-snapshots`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute("CREATE TABLE IF NOT EXISTS snapshots (kind TEXT NOT NULL, id INTEGER NOT NULL, "
+                                "payload BLOB NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (kind, id))")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, kind, item_id):
+        row = self._connect().execute("SELECT payload FROM snapshots WHERE kind = ? AND id = ?",
+                                      (kind, item_id)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, kind, item_id, bundle):
+        self._connect().execute("INSERT OR REPLACE INTO snapshots (kind, id, payload, fetched_at) VALUES (?, ?, ?, ?)",
+                                (kind, item_id, zlib.compress(json.dumps(bundle).encode()), time.time()))
+
+    def fetched_at(self, kind, item_id):
+        row = self._connect().execute("SELECT fetched_at FROM snapshots WHERE kind = ? AND id = ?",
+                                      (kind, item_id)).fetchone()
+        return row[0] if row else None
+
+    def counts(self):
+        return dict(self._connect().execute("SELECT kind, count(*) FROM snapshots GROUP BY kind").fetchall())
+
+def make_snapshot_store(path):
+    if not path:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, 'snapshots.db')
+    return SnapshotStore(path)
+
+snapshot_store = make_snapshot_store(SNAPSHOT_PATH)
+
+# ------------- Background tasks -------------
+
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 4))
+BACKGROUND_QUEUE_MAX = int(os.environ.get("BACKGROUND_QUEUE_MAX", 1000))
+BACKGROUND_SHUTDOWN_TIMEOUT = float(os.environ.get("BACKGROUND_SHUTDOWN_TIMEOUT", 10))
+# 1 runs every job inline in the submitting request (tests, debugging)
+BACKGROUND_TASKS_SYNC = os.environ.get("BACKGROUND_TASKS_SYNC", "0") == "1"
+
+class TaskExecutor:
+    """
+    Small in-process pool for fire-and-forget work a response shouldn't wait
+    for (cache refreshes, prefetches). Jobs wait in a bounded queue and are
+    dropped when it is full, so a slow upstream never backs up into requests.
+    Jobs submitted with a key are skipped while an equal key is queued or
+    running. Worker threads start on first use, i.e. after gunicorn forks;
+    jobs registered with every() are submitted by a timer thread that is
+    restarted in each forked worker.
+    """
+    def __init__(self, workers=BACKGROUND_WORKERS, max_queue=BACKGROUND_QUEUE_MAX, sync=False):
+        self.workers = workers
+        self.sync = sync
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._closed = False
+        self._keys = set()
+        self._running = 0
+        self._counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'dropped': 0, 'coalesced': 0}
+        self._latency = {}
+        self._periodic = []
+        self._timer_pid = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Only the forking thread survives; start from a clean slate
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._keys = set()
+        self._running = 0
+        if self._periodic:
+            self._start_timer()
+
+    def every(self, interval, func, *args, key=None, **kwargs):
+        """Submit func(*args, **kwargs) every `interval` seconds, starting one interval from now"""
+        with self._lock:
+            self._periodic.append([time.monotonic() + interval, interval, func, args, kwargs, key])
+        self._start_timer()
+
+    def _start_timer(self):
+        with self._lock:
+            if self._timer_pid == os.getpid():
+                return
+            self._timer_pid = os.getpid()
+        threading.Thread(target=self._tick, name="background-timer", daemon=True).start()
+
+    def _tick(self):
+        while not self._closed:
+            now = time.monotonic()
+            with self._lock:
+                due = [job for job in self._periodic if job[0] <= now]
+                for job in due:
+                    job[0] = now + job[1]
+                wake = min((job[0] for job in self._periodic), default=now + 1)
+            for _, _, func, args, kwargs, key in due:
+                self.submit(func, *args, key=key, **kwargs)
+            # Wake at least once a second to notice shutdown
+            time.sleep(min(max(wake - time.monotonic(), 0.01), 1))
+
+    def submit(self, func, *args, key=None, **kwargs):
+        """Queue func(*args, **kwargs); returns False if the job was not accepted"""
+        name = getattr(func, '__name__', 'task')
+        with self._lock:
+            if self._closed:
+                self._counts['dropped'] += 1
+                return False
+            if key is not None:
+                if key in self._keys:
+                    self._counts['coalesced'] += 1
+                    return False
+                self._keys.add(key)
+            self._counts['submitted'] += 1
+            if not self.sync:
+                self._start_workers()
+        job = (name, func, args, kwargs, key, time.monotonic())
+        if self.sync:
+            self._run(job)
+            return True
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._counts['dropped'] += 1
+                self._keys.discard(key)
+            app.logger.warning(f"Background queue full, dropped {name}")
+            return False
+        return True
+
+    def _start_workers(self):
+        # Threads don't survive a fork, so a new process starts its own
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._threads = [threading.Thread(target=self._work, name=f"background-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job):
+        name, func, args, kwargs, key, queued = job
+        started = time.monotonic()
+        with self._lock:
+            self._running += 1
+        failed = False
+        try:
+            with app.app_context():
+                func(*args, **kwargs)
+        except Exception:
+            failed = True
+            app.logger.exception(f"Background task {name} failed")
+        finished = time.monotonic()
+        with self._lock:
+            self._running -= 1
+            self._keys.discard(key)
+            self._counts['failed' if failed else 'completed'] += 1
+            latency = self._latency.setdefault(name, {'count': 0, 'wait': 0.0, 'run': 0.0, 'max_run': 0.0})
+            latency['count'] += 1
+            latency['wait'] += started - queued
+            latency['run'] += finished - started
+            latency['max_run'] = max(latency['max_run'], finished - started)
+
+    def shutdown(self, timeout=BACKGROUND_SHUTDOWN_TIMEOUT):
+        """Stop taking jobs and give the queued ones up to `timeout` seconds to finish"""
+        with self._lock:
+            self._closed = True
+            threads = self._threads if self._pid == os.getpid() else []
+        deadline = time.monotonic() + timeout
+        for _ in threads:
+            try:
+                self._queue.put(None, timeout=max(0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in threads):
+            app.logger.warning(f"Background jobs still pending after {timeout}s, abandoning them")
+
+    def stats(self):
+        with self._lock:
+            tasks = {name: {'count': l['count'],
+                            'avg_wait_ms': round(l['wait'] / l['count'] * 1000, 1),
+                            'avg_run_ms': round(l['run'] / l['count'] * 1000, 1),
+                            'max_run_ms': round(l['max_run'] * 1000, 1)}
+                     for name, l in self._latency.items()}
+            return {'queue_length': self._queue.qsize(), 'queue_max': self._queue.maxsize,
+                    'workers': self.workers, 'running': self._running, 'sync': self.sync,
+                    **self._counts, 'tasks': tasks}
+
+background = TaskExecutor(sync=BACKGROUND_TASKS_SYNC)
+atexit.register(background.shutdown)
+
+# ------------- View counts -------------
+
+VIEW_COUNTS_PATH = os.environ.get("VIEW_COUNTS_PATH")
+VIEW_FLUSH_INTERVAL = float(os.environ.get("VIEW_FLUSH_INTERVAL", 30))
+VIEW_KEEP_DAYS = int(os.environ.get("VIEW_KEEP_DAYS", 90))
+VIEW_PERIODS = {'day': 1, 'week': 7, 'month': 30}
+
+class ViewCounter:
+    """
+    Views per title and UTC day. A request only bumps an in-memory counter;
+    the totals are added to a SQLite file shared by all workers in a single
+    transaction by flush(), which the background executor runs every
+    VIEW_FLUSH_INTERVAL seconds and atexit runs once more.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pruned_day = None
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS views (kind TEXT NOT NULL, id INTEGER NOT NULL, "
+                     "day INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (kind, day, id))")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def record(self, kind, item_id):
+        key = (kind, int(item_id), int(time.time() // 86400))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        today = int(time.time() // 86400)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT INTO views (kind, id, day, count) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT(kind, day, id) DO UPDATE SET count = count + excluded.count",
+                             [(kind, item_id, day, count) for (kind, item_id, day), count in pending.items()])
+            if self._pruned_day != today:
+                conn.execute("DELETE FROM views WHERE day < ?", (today - VIEW_KEEP_DAYS,))
+                self._pruned_day = today
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Keep the counts for the next flush
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+            app.logger.warning(f"Could not write view counts: {e}")
+
+    def top(self, kind, days=1, limit=20):
+        """
+        [(id, views)] for the most viewed titles of a kind over the last
+        `days` days, as of the last flush. Read-only: never takes the write lock.
+        """
+        first_day = int(time.time() // 86400) - days + 1
+        return self._connect().execute(
+            "SELECT id, SUM(count) AS views FROM views WHERE kind = ? AND day >= ? "
+            "GROUP BY id ORDER BY views DESC, id LIMIT ?", (kind, first_day, limit)).fetchall()
+
+def make_view_counter(path):
+    if not path:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, 'views.db')
+    return ViewCounter(path)
+
+view_counts = make_view_counter(VIEW_COUNTS_PATH)
+background.every(VIEW_FLUSH_INTERVAL, view_counts.flush, key='view-counts-flush')
+atexit.register(view_counts.flush)
+
+# Detail pages are counted here rather than in the views, which don't run
+# when the page comes from the cache
+VIEW_ENDPOINTS = {
+    'movie_detail': ('movie', 'movie_id'),
+    'tv_detail': ('tv', 'tv_id'),
+    'person_detail': ('person', 'person_id'),
+}
+
+@app.after_request
+def count_view(response):
+    counted = VIEW_ENDPOINTS.get(request.endpoint)
+    if counted and request.method == 'GET' and response.status_code in (200, 304):
+        kind, arg = counted
+        view_counts.record(kind, request.view_args[arg])
+    return response
+
 # ------------- Helpers -------------
 
 def get_best_match(title, choices):
     match = process.extractOne(title, choices, score_cutoff=60)
     return match[0] if match else None
 
-def get_movie_recommendations(movie_name):
-    titles = movie_df["title"].tolist()
-    closest_match = get_best_match(movie_name, titles)
+def ranked_neighbors(similarity, index):
+    """Row indices ordered by descending similarity (ties keep dataset order)"""
+    return np.argsort(-np.asarray(similarity[index]), kind='stable')
 
-    if not closest_match:
-        return None, []
+RECS_MEMO_MAX = int(os.environ.get("RECS_MEMO_MAX", 4096))
 
-    index_of_movie = movie_df[movie_df.title == closest_match].index.values[0]
-    similarity_scores = list(enumerate(movie_similarity[index_of_movie]))
-    sorted_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
+_recs_memo = OrderedDict()
+_recs_memo_lock = threading.Lock()
 
-    searched_movie_row = movie_df.iloc[index_of_movie]
-    searched_movie = {
-        "id": searched_movie_row["id"],
-        "title": searched_movie_row["title"],
-        "poster_path": searched_movie_row["poster_path"]
-    }
+def memoize_recommendations(func):
+    """
+    Keep the materialised result of a row-based recommender per (row, k),
+    least recently used first out. Results are shared between requests, so
+    callers must not modify them. The models are loaded once per process,
+    so the memo needs no invalidation: new model files take effect (with a
+    fresh memo) when the workers restart.
+    """
+    @wraps(func)
+    def wrapper(row, k):
+        key = (func.__name__, row, k)
+        with _recs_memo_lock:
+            if key in _recs_memo:
+                _recs_memo.move_to_end(key)
+                return _recs_memo[key]
+        value = func(row, k)
+        with _recs_memo_lock:
+            _recs_memo[key] = value
+            while len(_recs_memo) > RECS_MEMO_MAX:
+                _recs_memo.popitem(last=False)
+        return value
+    return wrapper
+
+# Titles listed on the /recommend page
+RECOMMEND_PAGE_SIZE = 30
+
+@memoize_recommendations
+def movie_recommendations_for_row(index_of_movie, k):
+    searched_movie = movie_catalog.row(index_of_movie)
 
     recs = []
     titles_seen = set()
-    for i, _ in sorted_scores[1:]:
-        movie = movie_df.iloc[i]
+    for i in ranked_neighbors(movie_similarity, index_of_movie)[1:]:
+        movie = movie_catalog.row(i)
         title = movie["title"]
         if title == searched_movie["title"] or title in titles_seen:
             continue
         titles_seen.add(title)
-        recs.append({
-            "id": movie["id"],
-            "title": title,
-            "poster_path": movie["poster_path"]
-        })
-        if len(recs) == 30:
+        recs.append(movie)
+        if len(recs) == k:
             break
 
     return searched_movie, recs
 
+def get_movie_recommendations(movie_name):
+    closest_match = get_best_match(movie_name, movie_catalog.titles)
+
+    if not closest_match:
+        return None, []
+
+    return movie_recommendations_for_row(movie_catalog.find(closest_match), RECOMMEND_PAGE_SIZE)
+
+@memoize_recommendations
+def tv_recommendations_for_row(index_of_tv, k):
+    searched_tv = tv_catalog.row(index_of_tv)
+
+    recs = []
+    titles_seen = set()
+    for i in ranked_neighbors(tv_similarity, index_of_tv)[1:]:
+        tv = tv_catalog.row(i)
+        name = tv["name"]
+        if name == searched_tv["name"] or name in titles_seen:
+            continue
+        titles_seen.add(name)
+        recs.append(tv)
+        if len(recs) == k:
+            break
+
+    return searched_tv, recs
+
 def get_tv_recommendations(tv_name):
     try:
-        # Check what columns actually exist in your DataFrame
-        print("Available columns in tv_df:", tv_df.columns.tolist())
-        
-        # Adjust based on actual column names
-        title_column = "name" if "name" in tv_df.columns else "title"
-        titles = tv_df[title_column].tolist()
-        
-        closest_match = get_best_match(tv_name, titles)
+        closest_match = get_best_match(tv_name, tv_catalog.titles)
 
         if not closest_match:
             return None, []
 
-        index_of_tv = tv_df[tv_df[title_column] == closest_match].index.values[0]
-        similarity_scores = list(enumerate(tv_similarity[index_of_tv]))
-        sorted_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-
-        searched_tv_row = tv_df.iloc[index_of_tv]
-        searched_tv = {
-            "id": searched_tv_row["id"],
-            "name": searched_tv_row[title_column],
-            "poster_path": searched_tv_row["poster_path"]
-        }
-
-        recs = []
-        titles_seen = set()
-        for i, _ in sorted_scores[1:]:
-            tv = tv_df.iloc[i]
-            name = tv[title_column]
-            if name == searched_tv["name"] or name in titles_seen:
-                continue
-            titles_seen.add(name)
-            recs.append({
-                "id": tv["id"],
-                "name": name,
-                "poster_path": tv["poster_path"]
-            })
-            if len(recs) == 30:
-                break
-
-        return searched_tv, recs
+        return tv_recommendations_for_row(tv_catalog.find(closest_match), RECOMMEND_PAGE_SIZE)
     except Exception as e:
         app.logger.error(f"Error in get_tv_recommendations: {str(e)}")
         return None, []
 
+# ------------- Unified title search -------------
+
+SEARCH_SCORE_CUTOFF = 60
+
+class TitleIndex:
+    """
+    Movie and TV titles in one list, normalised once (lowercase, no
+    punctuation) so a query is matched against both catalogs in a single
+    rapidfuzz pass.
+    """
+    def __init__(self, catalogs):
+        self.catalogs = catalogs
+        self.keys = []
+        self.entries = []
+        self.exact = {}
+        for kind, catalog in catalogs.items():
+            for row, title in enumerate(catalog.titles):
+                key = default_process(str(title))
+                if key:
+                    self.exact.setdefault(key, []).append(len(self.entries))
+                    self.keys.append(key)
+                    self.entries.append((kind, row))
+        self.kinds = np.array([kind for kind, _ in self.entries])
+        self.popularity = np.array([catalogs[kind].popularity[row] for kind, row in self.entries],
+                                   dtype=np.float64)
+
+    def search(self, query, limit=10, score_cutoff=SEARCH_SCORE_CUTOFF):
+        """Best (kind, row, score) matches; equal scores go to the more popular title"""
+        query = default_process(query or '')
+        if not query:
+            return []
+        # Score every title, then rank by (score, popularity) before cutting
+        # to `limit`; truncating first would drop popular titles among ties
+        scores = process.cdist([query], self.keys, processor=None, score_cutoff=score_cutoff,
+                               dtype=np.float64)[0]
+        hits = np.flatnonzero(scores)
+        order = np.lexsort((-self.popularity[hits], -scores[hits]))[:limit]
+        return [(*self.entries[i], float(scores[i])) for i in hits[order]]
+
+    def best(self, query):
+        results = self.search(query, limit=5)
+        return results[0] if results else None
+
+    def _pick(self, positions, year):
+        """Among equally named titles prefer the given year, then popularity"""
+        def rank(i):
+            kind, row = self.entries[i]
+            catalog = self.catalogs[kind]
+            released = str(catalog.row(row)[catalog.date_key] or '')
+            return (bool(year) and released.startswith(str(year)), catalog.popularity[row])
+        return max(positions, key=rank)
+
+    def match_many(self, queries, score_cutoff=85, chunk_size=200):
+        """
+        Resolve many (title, kind, year) queries at once, kind and year being
+        optional hints. Exact normalised titles are looked up directly; the
+        rest are scored against every title with rapidfuzz's cdist, using
+        plain ratio (much cheaper than WRatio across thousands of queries)
+        and chunk_size queries at a time. Returns (kind, row) or None per query.
+        """
+        results = [None] * len(queries)
+        fuzzy = []
+        for n, (title, kind, year) in enumerate(queries):
+            key = default_process(str(title or ''))
+            if not key:
+                continue
+            positions = [i for i in self.exact.get(key, []) if kind is None or self.entries[i][0] == kind]
+            if positions:
+                results[n] = self.entries[self._pick(positions, year)]
+            else:
+                fuzzy.append((n, key, kind))
+        for start in range(0, len(fuzzy), chunk_size):
+            chunk = fuzzy[start:start + chunk_size]
+            scores = process.cdist([key for _, key, _ in chunk], self.keys, scorer=fuzz.ratio,
+                                   processor=None, score_cutoff=score_cutoff, dtype=np.uint8, workers=-1)
+            for (n, _, kind), row_scores in zip(chunk, scores):
+                if kind is not None:
+                    row_scores = np.where(self.kinds == kind, row_scores, 0)
+                top = row_scores.max()
+                if top:
+                    tied = np.flatnonzero(row_scores == top)
+                    results[n] = self.entries[int(tied[np.argmax(self.popularity[tied])])]
+        return results
+
+title_index = TitleIndex({'movie': movie_catalog, 'tv': tv_catalog})
+
+RECOMMENDERS = {
+    'movie': movie_recommendations_for_row,
+    'tv': tv_recommendations_for_row,
+}
+
+def search_result(kind, row, score):
+    catalog = title_index.catalogs[kind]
+    item = catalog.row(row)
+    date = item.get(catalog.date_key) or ''
+    return {
+        'type': kind,
+        'id': item['id'],
+        'title': item[catalog.title_key],
+        'year': str(date)[:4] or None,
+        'poster_path': item.get('poster_path'),
+        'score': round(score, 1),
+        'url': url_for('movie_detail', movie_id=item['id']) if kind == 'movie' else url_for('tv_detail', tv_id=item['id']),
+    }
+
+@tmdb_cached()
 def fetch_movies_by_category(category, genre_id=None):
     try:
-        url = f"https://api.themoviedb.org/3/movie/{category}" if not genre_id else \
-              f"https://api.themoviedb.org/3/discover/movie?with_genres={genre_id}"
+        url = f"{TMDB_API_URL}/movie/{category}" if not genre_id else \
+              f"{TMDB_API_URL}/discover/movie?with_genres={genre_id}"
         params = {"api_key": TMDB_API_KEY}
-        response = requests.get(url, params=params)
+        response = tmdb_get(url, params=params, timeout=TMDB_TIMEOUT)
         response.raise_for_status()  # Raises an HTTPError for bad responses
         return response.json().get("results", [])[:20]
     except requests.RequestException as e:
         print(f"Error fetching movies for {category}: {e}")
         return []
 
+@tmdb_cached()
 def fetch_tv_by_category(category, genre_id=None):
     try:
-        url = f"https://api.themoviedb.org/3/tv/{category}" if not genre_id else \
-              f"https://api.themoviedb.org/3/discover/tv?with_genres={genre_id}"
+        url = f"{TMDB_API_URL}/tv/{category}" if not genre_id else \
+              f"{TMDB_API_URL}/discover/tv?with_genres={genre_id}"
         params = {"api_key": TMDB_API_KEY}
-        response = requests.get(url, params=params)
+        response = tmdb_get(url, params=params, timeout=TMDB_TIMEOUT)
         response.raise_for_status()
         return response.json().get("results", [])[:20]
     except requests.RequestException as e:
         print(f"Error fetching TV shows for {category}: {e}")
         return []
     
+@tmdb_cached(cache_if=lambda credits: credits['cast'] or credits['crew'])
 def get_movie_credits(movie_id):
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/credits?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/movie/{movie_id}/credits?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     
     if response.status_code != 200:
         return {'cast': [], 'crew': []}  
@@ -203,49 +1170,66 @@ def get_movie_credits(movie_id):
         'crew': crew
     }
 
-def get_movie_info(movie_id):
+@tmdb_cached()
+def get_movie_details(movie_id):
     try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
-        response = requests.get(url)
+        url = f"{TMDB_API_URL}/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
+        response = tmdb_get(url, timeout=TMDB_TIMEOUT)
         if response.status_code != 200:
-            return None, []  # Return tuple even if failed
+            return None
 
         movie_data = response.json()
 
-        # Get related (franchise) movies
-        collection = movie_data.get("belongs_to_collection")
-        related_movies = []
-        if collection:
-            collection_id = collection["id"]
-            coll_url = f"https://api.themoviedb.org/3/collection/{collection_id}?api_key={TMDB_API_KEY}&language=en-US"
-            coll_response = requests.get(coll_url)
-            if coll_response.status_code == 200:
-                related_movies = coll_response.json().get("parts", [])
-                # Remove the original movie from related list
-                related_movies = [m for m in related_movies if m["id"] != movie_id]
-
         # Convert genre list
         movie_data["genres"] = [g["name"] for g in movie_data.get("genres", [])]
 
-        return movie_data, related_movies
+        return movie_data
     except Exception as e:
         print("Error fetching movie info:", e)
-        return None, []
+        return None
+
+@tmdb_cached()
+def get_collection_parts(collection_id):
+    try:
+        coll_url = f"{TMDB_API_URL}/collection/{collection_id}?api_key={TMDB_API_KEY}&language=en-US"
+        coll_response = tmdb_get(coll_url, timeout=TMDB_TIMEOUT)
+        if coll_response.status_code == 200:
+            return coll_response.json().get("parts", [])
+    except requests.RequestException as e:
+        print("Error fetching collection:", e)
+    return []
+
+def get_movie_info(movie_id):
+    movie_data = get_movie_details(movie_id)
+    if not movie_data:
+        return None, []  # Return tuple even if failed
+
+    # Get related (franchise) movies
+    collection = movie_data.get("belongs_to_collection")
+    related_movies = []
+    if collection:
+        # Remove the original movie from related list
+        related_movies = [m for m in get_collection_parts(collection["id"]) if m["id"] != movie_id]
 
+    return movie_data, related_movies
+
+@tmdb_cached(cache_if=lambda trailer_key: True)
 def get_movie_trailer(movie_id):
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/videos?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/movie/{movie_id}/videos?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     if response.status_code == 200:
         videos = response.json().get("results", [])
         for video in videos:
             if video['site'] == 'YouTube' and video['type'] == 'Trailer':
                 return video['key']
-    return None
+        return None
+    return Uncached()
 
+@tmdb_cached()
 def get_tv_info(tv_id):
     try:
-        url = f"https://api.themoviedb.org/3/tv/{tv_id}?api_key={TMDB_API_KEY}&language=en-US"
-        response = requests.get(url)
+        url = f"{TMDB_API_URL}/tv/{tv_id}?api_key={TMDB_API_KEY}&language=en-US"
+        response = tmdb_get(url, timeout=TMDB_TIMEOUT)
         if response.status_code != 200:
             return None
 
@@ -254,10 +1238,83 @@ def get_tv_info(tv_id):
         print("Error fetching TV info:", e)
         return None
 
+# TMDB accepts at most 20 append_to_response entries per request
+SEASON_BATCH_SIZE = 20
+SEASON_PREFETCH = os.environ.get("SEASON_PREFETCH", "1") == "1"
+
+def season_summary(data):
+    """Keep only what the episode list shows"""
+    return {
+        'season_number': data.get('season_number'),
+        'name': data.get('name'),
+        'overview': data.get('overview'),
+        'air_date': data.get('air_date'),
+        'poster_path': data.get('poster_path'),
+        'episodes': [{
+            'episode_number': episode.get('episode_number'),
+            'name': episode.get('name'),
+            'overview': episode.get('overview'),
+            'air_date': episode.get('air_date'),
+            'runtime': episode.get('runtime'),
+            'still_path': episode.get('still_path'),
+            'vote_average': episode.get('vote_average'),
+        } for episode in data.get('episodes', [])]
+    }
+
+@tmdb_cached()
+def get_tv_season(tv_id, season_number):
+    try:
+        url = f"{TMDB_API_URL}/tv/{tv_id}/season/{season_number}?api_key={TMDB_API_KEY}&language=en-US"
+        response = tmdb_get(url, timeout=TMDB_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        return season_summary(response.json())
+    except Exception as e:
+        print("Error fetching TV season:", e)
+        return None
+
+def get_tv_seasons(tv_id, season_numbers):
+    """
+    Several seasons at once: cached ones come from the shared cache and the
+    rest are fetched SEASON_BATCH_SIZE at a time through append_to_response,
+    each stored under the same key get_tv_season uses.
+    """
+    seasons = {}
+    missing = []
+    for number in season_numbers:
+        cached = cache_read(get_tv_season.cache_key(tv_id, number))
+        if cached is MISSING:
+            missing.append(number)
+        else:
+            seasons[number] = cached
+    for start in range(0, len(missing), SEASON_BATCH_SIZE):
+        batch = missing[start:start + SEASON_BATCH_SIZE]
+        append = ','.join(f"season/{number}" for number in batch)
+        try:
+            url = f"{TMDB_API_URL}/tv/{tv_id}?api_key={TMDB_API_KEY}&language=en-US&append_to_response={append}"
+            response = tmdb_get(url, timeout=TMDB_TIMEOUT)
+            data = response.json() if response.status_code == 200 else {}
+        except Exception as e:
+            app.logger.warning(f"Error fetching seasons {batch} of TV {tv_id}: {e}")
+            data = {}
+        for number in batch:
+            season = data.get(f"season/{number}")
+            seasons[number] = season_summary(season) if season else None
+            if season:
+                cache_write(get_tv_season.cache_key(tv_id, number), seasons[number])
+    return seasons
+
+def latest_season_number(seasons):
+    """The season a visitor is most likely to open: the newest aired one, specials aside"""
+    aired = [s['season_number'] for s in seasons
+             if s.get('season_number') and s.get('air_date')]
+    return max(aired, default=None)
+
+@tmdb_cached(cache_if=lambda credits: credits['cast'] or credits['crew'])
 def get_tv_credits(tv_id):
     """Fetch TV show credits from TMDB API and ensure proper structure"""
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/credits?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/tv/{tv_id}/credits?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     
     if response.status_code != 200:
         return {'cast': [], 'crew': []}
@@ -291,30 +1348,191 @@ def get_tv_credits(tv_id):
         'crew': crew
     }
 
+@tmdb_cached(cache_if=lambda trailer_key: True)
 def get_tv_trailer(tv_id):
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/videos?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/tv/{tv_id}/videos?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     if response.status_code == 200:
         videos = response.json().get("results", [])
         for video in videos:
             if video['site'] == 'YouTube' and video['type'] == 'Trailer':
                 return video['key']
-    return None
+        return None
+    return Uncached()
 
+@tmdb_cached()
 def get_similar_tv(tv_id):
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/similar?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/tv/{tv_id}/similar?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     if response.status_code == 200:
         return response.json().get("results", [])[:6]
     return []
 
+@tmdb_cached()
 def get_similar_movie(movie_id):
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/similar?api_key={TMDB_API_KEY}"
-    response = requests.get(url)
+    url = f"{TMDB_API_URL}/movie/{movie_id}/similar?api_key={TMDB_API_KEY}"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
     if response.status_code == 200:
         return response.json().get("results", [])[:6]
     return []
 
+@tmdb_cached()
+def get_person_info(person_id):
+    url = f"{TMDB_API_URL}/person/{person_id}?api_key={TMDB_API_KEY}&append_to_response=combined_credits,images"
+    response = tmdb_get(url, timeout=TMDB_TIMEOUT)
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+# Neighbours scanned for the "Similar" rows on detail pages
+ML_RECOMMENDATION_WINDOW = 11
+
+@memoize_recommendations
+def movie_ml_recommendations_for_row(index_of_movie, k):
+    ml_recommendations = []
+    searched_title = movie_catalog.titles[index_of_movie]
+    titles_seen = set()
+    for i in ranked_neighbors(movie_similarity, index_of_movie)[1:k + 1]:
+        movie = movie_catalog.row(i)
+        title = movie["title"]
+        if title == searched_title or title in titles_seen:
+            continue
+        titles_seen.add(title)
+        movie["release_date"] = movie["release_date"][:4] if movie["release_date"] else "N/A"
+        ml_recommendations.append(movie)
+    return ml_recommendations
+
+@memoize_recommendations
+def tv_ml_recommendations_for_row(index_of_tv, k):
+    ml_recommendations = []
+    searched_name = tv_catalog.titles[index_of_tv]
+    titles_seen = set()
+    for i in ranked_neighbors(tv_similarity, index_of_tv)[1:k + 1]:
+        tv = tv_catalog.row(i)
+        title = tv["name"]
+        if title == searched_name or title in titles_seen:
+            continue
+        titles_seen.add(title)
+        tv["first_air_date"] = tv["first_air_date"][:4] if tv["first_air_date"] else "N/A"
+        ml_recommendations.append(tv)
+    return ml_recommendations
+
+def get_movie_ml_recommendations(movie_id, movie_title=None):
+    """
+    Top similar movies from the precomputed model. Movies in the dataset are
+    found by id; the title is only fuzzy-matched for ones that aren't.
+    """
+    index_of_movie = movie_catalog.index_of(movie_id)
+    if index_of_movie is None and movie_title:
+        closest_match = get_best_match(movie_title, movie_catalog.titles)
+        index_of_movie = movie_catalog.find(closest_match) if closest_match else None
+    if index_of_movie is None:
+        return []
+    return movie_ml_recommendations_for_row(index_of_movie, ML_RECOMMENDATION_WINDOW)
+
+def get_tv_ml_recommendations(tv_id, tv_name=None):
+    """Top similar shows from the precomputed model, by id first and then by name"""
+    index_of_tv = tv_catalog.index_of(tv_id)
+    if index_of_tv is None and tv_name:
+        closest_match = get_best_match(tv_name, tv_catalog.titles)
+        index_of_tv = tv_catalog.find(closest_match) if closest_match else None
+    if index_of_tv is None:
+        return []
+    return tv_ml_recommendations_for_row(index_of_tv, ML_RECOMMENDATION_WINDOW)
+
+def fetch_movie_bundle(movie_id):
+    """Everything movie_detail needs from TMDB, or None if the movie can't be fetched"""
+    movie_details, related_movies = get_movie_info(movie_id)
+    if not movie_details:
+        return None
+    return {
+        'details': movie_details,
+        'related_movies': related_movies,
+        'trailer_key': get_movie_trailer(movie_id),
+        'credits': get_movie_credits(movie_id),
+        'streaming_providers': get_movie_watch_providers(movie_id),
+        'similar': get_similar_movie(movie_id)
+    }
+
+def fetch_tv_bundle(tv_id):
+    """Everything tv_detail needs from TMDB, or None if the show can't be fetched"""
+    tv_details = get_tv_info(tv_id)
+    if not tv_details:
+        return None
+    return {
+        'show': tv_details,
+        'trailer_key': get_tv_trailer(tv_id),
+        'credits': get_tv_credits(tv_id),
+        'streaming_providers': get_tv_watch_providers(tv_id),
+        'similar': get_similar_tv(tv_id)
+    }
+
+DETAIL_FETCHERS = {
+    'movie': fetch_movie_bundle,
+    'tv': fetch_tv_bundle,
+    'person': get_person_info,
+}
+
+def catalog_stub_bundle(kind, item_id):
+    """Bare-bones bundle built from the local catalog when nothing else is available"""
+    catalog = {'movie': movie_catalog, 'tv': tv_catalog}.get(kind)
+    row = catalog.index_of(item_id) if catalog else None
+    if row is None:
+        return None
+    details = {**catalog.row(row), 'genres': [], 'overview': '', 'vote_average': 0}
+    if kind == 'movie':
+        details['runtime'] = ''
+        return {'details': details, 'related_movies': [], 'trailer_key': None,
+                'credits': {'cast': [], 'crew': []}, 'streaming_providers': None, 'similar': []}
+    details.update(number_of_seasons='?', number_of_episodes='?', seasons=[])
+    return {'show': details, 'trailer_key': None, 'credits': {'cast': [], 'crew': []},
+            'streaming_providers': None, 'similar': []}
+
+def load_detail_bundle(kind, item_id):
+    """Live TMDB bundle, falling back to the snapshot store and then the catalog"""
+    if SNAPSHOT_MODE in ('prefer', 'only'):
+        bundle = snapshot_store.get(kind, item_id)
+        if bundle:
+            return bundle
+    bundle = None
+    # While TMDB is known to be down go straight to the fallbacks
+    if SNAPSHOT_MODE != 'only' and tmdb_breaker.allow():
+        try:
+            bundle = DETAIL_FETCHERS[kind](item_id)
+        except requests.RequestException as e:
+            app.logger.warning(f"TMDB fetch for {kind} {item_id} failed, trying snapshot: {e}")
+    if bundle:
+        return bundle
+    # Whatever comes next is a stand-in; keep pages built from it out of the page cache
+    g.degraded = True
+    if SNAPSHOT_MODE == 'fallback':
+        bundle = snapshot_store.get(kind, item_id)
+    return bundle or catalog_stub_bundle(kind, item_id)
+
+def load_detail_section(kind, item_id, section, fetch, valid=bool):
+    """
+    One section of a detail bundle (e.g. 'credits'), fetched on its own with
+    the same snapshot/catalog fallbacks as load_detail_bundle.
+    """
+    if SNAPSHOT_MODE in ('prefer', 'only'):
+        bundle = snapshot_store.get(kind, item_id)
+        if bundle:
+            return bundle.get(section)
+    value = None
+    if SNAPSHOT_MODE != 'only' and tmdb_breaker.allow():
+        try:
+            value = fetch(item_id)
+        except requests.RequestException as e:
+            app.logger.warning(f"TMDB fetch of {section} for {kind} {item_id} failed, trying snapshot: {e}")
+    if valid(value):
+        return value
+    g.degraded = True
+    if SNAPSHOT_MODE == 'fallback':
+        bundle = snapshot_store.get(kind, item_id)
+        if bundle:
+            return bundle.get(section)
+    return (catalog_stub_bundle(kind, item_id) or {}).get(section, value)
+
 
 # ------------- Routes -------------
 
@@ -361,61 +1579,353 @@ def get_genres_dict():
         }
     }
 
+# ------------- Image proxy -------------
+
+TMDB_IMAGE_BASE = os.environ.get("TMDB_IMAGE_BASE", "https://image.tmdb.org/t/p")
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR") or os.path.join(app.instance_path, 'images')
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+IMAGE_MAX_AGE = 30 * 24 * 60 * 60
+# TMDB's published poster/profile/logo/backdrop widths
+IMAGE_SIZES = {'w45', 'w92', 'w154', 'w185', 'w300', 'w342', 'w500', 'w780', 'w1280', 'h632', 'original'}
+# Next size up, used for the 2x entry of srcset
+IMAGE_SIZE_2X = {'w45': 'w92', 'w92': 'w185', 'w154': 'w342', 'w185': 'w342', 'w300': 'w780',
+                 'w342': 'w780', 'w500': 'w780', 'w780': 'original', 'w1280': 'original'}
+IMAGE_NAME_RE = re.compile(r'[A-Za-z0-9_-]+\.(jpg|jpeg|png|svg|webp)')
+
+image_session = requests.Session()
+image_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=16))
+
+class ImageCache:
+    """
+    TMDB images on local disk, laid out as <dir>/<size>/<file>. Every worker
+    writes to the same directory, so each one re-measures it with a full walk
+    at least every rescan_interval seconds, and sooner once its own writes
+    push its estimate over max_bytes. Walks and eviction (least recently
+    served first, down to 90% of the budget) run on the background executor,
+    never on a request thread.
+    """
+    RESCAN_INTERVAL = 300
+    # Last-served times only need to be roughly right for eviction
+    TOUCH_INTERVAL = 60 * 60
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = 0
+        self._scanned_at = None
+
+    def path(self, size, filename):
+        return os.path.join(self.directory, size, filename)
+
+    def _files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, size, filename):
+        path = self.path(size, filename)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - mtime > self.TOUCH_INTERVAL:
+            try:
+                os.utime(path)  # mtime doubles as last-served time for eviction
+            except FileNotFoundError:
+                return None
+        return path
+
+    def put(self, size, filename, content):
+        path = self.path(size, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(content)
+            due = (self._scanned_at is None or self._size > self.max_bytes
+                   or time.monotonic() - self._scanned_at > self.RESCAN_INTERVAL)
+        if due:
+            background.submit(self.maintain, key='image-cache-maintain')
+        return path
+
+    def maintain(self):
+        """Measure the whole directory and evict if it is over budget"""
+        files = list(self._files())
+        total = sum(file_size for _, file_size, _ in files)
+        if total > self.max_bytes:
+            target = self.max_bytes * 0.9
+            for path, file_size, _ in sorted(files, key=lambda f: f[2]):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= file_size
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._size = total
+            self._scanned_at = time.monotonic()
+
+image_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+
+def tmdb_img(path, size='w185'):
+    """URL of a TMDB image through our proxy, or '' when there is no image"""
+    if not path:
+        return ''
+    return url_for('image_proxy', size=size, filename=path.lstrip('/'))
+
+def tmdb_srcset(path, size='w185'):
+    if not path:
+        return ''
+    srcset = f"{tmdb_img(path, size)} 1x"
+    if size in IMAGE_SIZE_2X:
+        srcset += f", {tmdb_img(path, IMAGE_SIZE_2X[size])} 2x"
+    return srcset
+
+app.jinja_env.globals.update(tmdb_img=tmdb_img, tmdb_srcset=tmdb_srcset)
+
+@app.route('/img/<size>/<filename>')
+def image_proxy(size, filename):
+    if size not in IMAGE_SIZES or not IMAGE_NAME_RE.fullmatch(filename):
+        abort(404)
+    path = image_cache.get(size, filename)
+    if path is None:
+        try:
+            response = image_session.get(f"{TMDB_IMAGE_BASE}/{size}/{filename}", timeout=TMDB_TIMEOUT)
+        except requests.RequestException as e:
+            app.logger.warning(f"Image fetch {size}/{filename} failed: {e}")
+            abort(502)
+        if response.status_code != 200:
+            abort(404)
+        path = image_cache.put(size, filename, response.content)
+    return send_file(path, max_age=IMAGE_MAX_AGE, conditional=True)
+
+# ------------- Public page cache -------------
+
+PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", 300))
+PAGE_MAX_AGE = int(os.environ.get("PAGE_MAX_AGE", 60))
+PAGE_STALE_WHILE_REVALIDATE = int(os.environ.get("PAGE_STALE_WHILE_REVALIDATE", 300))
+
+def page_data_version():
+    """Changes whenever the models or templates are redeployed"""
+    paths = [source for kind in CATALOG_SOURCES.values() for source in kind[:2]] + [JOINT_INDEX_PATH]
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        paths += [os.path.join(root, name) for name in files]
+    mtimes = [int(os.path.getmtime(path)) for path in paths if os.path.exists(path)]
+    return f"{os.environ.get('PAGE_CACHE_VERSION', '')}{max(mtimes, default=0):x}"
+
+PAGE_DATA_VERSION = page_data_version()
+
+def make_public(response, etag=True):
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_MAX_AGE
+    if PAGE_STALE_WHILE_REVALIDATE:
+        response.cache_control.stale_while_revalidate = PAGE_STALE_WHILE_REVALIDATE
+    if etag:
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        response.make_conditional(request)
+    return response
+
+def store_page(key, html):
+    # Kept past its TTL for PAGE_STALE_WHILE_REVALIDATE so a stale copy can
+    # be served while a fresh one is rendered in the background
+    if PAGE_CACHE_TTL:
+        cache_write(key, [time.time(), html], PAGE_CACHE_TTL + PAGE_STALE_WHILE_REVALIDATE)
+
+def refresh_page(view, path, key, args, kwargs):
+    """Re-render a public page outside any request and store it"""
+    with app.test_request_context(path):
+        g.public_page = True
+        response = make_response(view(*args, **kwargs))
+        html = response.get_data(as_text=True)
+        # During an outage keep serving the good stale copy rather than a stub
+        if response.status_code == 200 and not g.get('degraded'):
+            store_page(key, html)
+
+def page_path(params):
+    """
+    This page's URL rebuilt from the route arguments and only the query
+    parameters the view reads, so ?x=1, ?x=2, ... share one cache entry
+    """
+    query = {name: request.args[name] for name in sorted(params) if name in request.args}
+    return url_for(request.endpoint, **request.view_args, **query)
+
+def cached_page(view=None, *, params=()):
+    """
+    Serve the anonymous rendering of a public page from the shared cache,
+    with ETag/If-None-Match and Cache-Control headers. Pages are always
+    rendered as anonymous (g.public_page); the logged-in navbar and watchlist
+    buttons are switched on in the browser via /api/session. `params` lists
+    the query parameters that change the page; all others are ignored.
+    """
+    if view is None:
+        return lambda view: cached_page(view, params=params)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.public_page = True
+        if g.get('profile_reason') == 'admin':
+            # An admin asked to profile this page: render it, not the cached copy
+            return view(*args, **kwargs)
+        path = page_path(params)
+        key = f"page:{PAGE_DATA_VERSION}:{path}"
+        # A cache outage only costs a fresh render
+        entry = cache_read(key) if PAGE_CACHE_TTL else MISSING
+        if isinstance(entry, list):
+            rendered_at, html = entry
+            if time.time() - rendered_at > PAGE_CACHE_TTL:
+                background.submit(refresh_page, view, path, key, args, kwargs, key=key)
+            return make_public(app.response_class(html, mimetype='text/html'))
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or g.get('degraded'):
+            # Error pages and pages built from snapshot/catalog stand-ins
+            # are served as is and never cached
+            return response
+        if not response.is_streamed:
+            store_page(key, response.get_data(as_text=True))
+            return make_public(response)
+
+        # Streamed pages are stored once the last chunk has gone out (by
+        # then the request context is gone, so hold on to its g). Whether
+        # a rail failed is only known after the headers are sent, so this
+        # first render isn't marked public; copies served from the cache are.
+        request_g = g._get_current_object()
+
+        def capture(chunks):
+            parts = []
+            for chunk in chunks:
+                parts.append(chunk if isinstance(chunk, bytes) else chunk.encode())
+                yield chunk
+            if not request_g.get('degraded'):
+                store_page(key, b''.join(parts).decode())
+        response.response = capture(response.response)
+        return response
+    return wrapper
+
+@app.context_processor
+def inject_auth_view():
+    # Public (cached) pages never contain per-user markup
+    return {'show_user': not g.get('public_page') and current_user.is_authenticated}
+
+@app.route('/api/session')
+def session_info():
+    response = jsonify(authenticated=current_user.is_authenticated,
+                       name=current_user.name if current_user.is_authenticated else None)
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+@app.after_request
+def sync_logged_in_cookie(response):
+    # Readable hint so cached pages only ask /api/session for logged-in users
+    logged_in = current_user.is_authenticated
+    if logged_in and request.cookies.get('logged_in') != '1':
+        response.set_cookie('logged_in', '1', samesite='Lax', secure=app.config['SESSION_COOKIE_SECURE'])
+    elif not logged_in and 'logged_in' in request.cookies:
+        response.delete_cookie('logged_in')
+    else:
+        return response
+    # Never let a shared cache store a response that sets cookies
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+# Stream the homepage shell and each genre rail as soon as its data is ready
+INDEX_STREAMING = os.environ.get("INDEX_STREAMING", "1") == "1"
+rail_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("RAIL_WORKERS", 8)))
+
+def fetch_listing(fetch, *args, **kwargs):
+    """
+    A category/genre list for a public page. The fetchers return [] when
+    TMDB fails, so an empty list marks the page degraded and keeps it out of
+    the page cache.
+    """
+    items = fetch(*args, **kwargs)
+    if not items:
+        g.degraded = True
+    return items
+
+def genre_rails(fetch, genres):
+    """
+    Start fetching one rail per genre right away and return an iterator of
+    (genre name, items) pairs in genre order, skipping empty rails. The
+    first rail goes out as soon as it is ready while the rest keep loading.
+    """
+    futures = {rail_pool.submit(fetch, "popular", genre_id=genre_id): genre_info['name']
+               for genre_id, genre_info in genres.items()}
+
+    def in_genre_order():
+        try:
+            for future in futures:
+                items = future.result()
+                if items:
+                    yield futures[future], items[:20]
+                else:
+                    # Failed or empty rail: don't cache a page missing it
+                    g.degraded = True
+        finally:
+            # Client went away mid-stream: don't keep fetching for it
+            for future in futures:
+                future.cancel()
+    return in_genre_order()
+
 @app.route('/')
+@cached_page
 def index():
     genres = get_genres_dict()
     
-    # Fetch movies by genre
-    movie_genres_data = {}
-    for genre_id, genre_info in genres['movies'].items():  # Changed to get both id and info
-        genre_name = genre_info['name']  # Extract the name string
-        movies = fetch_movies_by_category("popular", genre_id=genre_id)
-        if movies:
-            movie_genres_data[genre_name] = movies[:20]  # Now using the string name as key
+    # Fetch movies and TV shows by genre concurrently
+    movie_genres_data = genre_rails(fetch_movies_by_category, genres['movies'])
+    tv_genres_data = genre_rails(fetch_tv_by_category, genres['tv'])
     
-    # Fetch TV shows by genre
-    tv_genres_data = {}
-    for genre_id, genre_info in genres['tv'].items():  # Same change for TV
-        genre_name = genre_info['name']
-        tv_shows = fetch_tv_by_category("popular", genre_id=genre_id)
-        if tv_shows: 
-            tv_genres_data[genre_name] = tv_shows[:20]
+    if not INDEX_STREAMING:
+        return render_template("index.html",
+                             movie_genres=list(movie_genres_data),
+                             tv_genres=list(tv_genres_data))
     
-    return render_template("index.html",
+    return stream_template("index.html",
                          movie_genres=movie_genres_data,
-                         tv_genres=tv_genres_data,
-                         img_url=TMDB_IMAGE_URL)
+                         tv_genres=tv_genres_data)
 
 @app.route('/movies/<category>')
+@cached_page
 def movies_category(category):
     valid_categories = ['popular', 'now_playing', 'upcoming', 'top_rated']
     if category not in valid_categories:
-        return render_template("404.html", message="Invalid category")
+        return render_template("404.html", message="Invalid category"), 404
     
-    movies = fetch_movies_by_category(category)
+    movies = fetch_listing(fetch_movies_by_category, category)
     return render_template("category.html",
                          title=f"{category.replace('_', ' ').title()} Movies",
                          items=movies,
-                         item_type="movie",
-                         img_url=TMDB_IMAGE_URL)
+                         item_type="movie")
 
 @app.route('/tv/<category>')
+@cached_page
 def tv_category(category):
     valid_categories = ['popular', 'airing_today', 'on_the_air', 'top_rated']
     if category not in valid_categories:
-        return render_template("404.html", message="Invalid category")
+        return render_template("404.html", message="Invalid category"), 404
     
-    tv_shows = fetch_tv_by_category(category)
+    tv_shows = fetch_listing(fetch_tv_by_category, category)
     return render_template("category.html",
                          title=f"{category.replace('_', ' ').title()} TV Shows",
                          items=tv_shows,
-                         item_type="tv",
-                         img_url=TMDB_IMAGE_URL)
+                         item_type="tv")
 
 @app.route("/recommend", methods=["POST"])
 def recommend():
     try:
-        content_type = request.form.get("content_type", "movie").strip().lower()
+        content_type = request.form.get("content_type", "all").strip().lower()
         name = request.form.get("movie", "").strip()
         
         if not name:
@@ -424,7 +1934,16 @@ def recommend():
             except:
                 return "Please enter a title to search", 400
         
-        if content_type == "movie":
+        if content_type == "all":
+            # One fuzzy pass over both catalogs decides which one was meant
+            match = title_index.best(name)
+            if match:
+                content_type, row, _ = match
+                searched_item, recs = RECOMMENDERS[content_type](row, RECOMMEND_PAGE_SIZE)
+            else:
+                searched_item, recs = None, []
+            template = f"recommend_{content_type}.html"
+        elif content_type == "movie":
             searched_item, recs = get_movie_recommendations(name)
             template = "recommend_movie.html"
         elif content_type == "tv":
@@ -438,16 +1957,17 @@ def recommend():
         
         if not searched_item:
             try:
-                return render_template("404.html", message=f"No {content_type} found with that name")
+                return render_template("404.html", message=f"No {'title' if content_type == 'all' else content_type} found with that name")
             except:
-                return f"No {content_type} found with that name", 404
+                return f"No {'title' if content_type == 'all' else content_type} found with that name", 404
+        
+        view_counts.record(content_type, searched_item['id'])
         
         return render_template(
             template,
             name=searched_item.get("title") if content_type == "movie" else searched_item.get("name"),
             searched_item=searched_item,
             recs=recs,
-            img_url=TMDB_IMAGE_URL,
             content_type=content_type
         )
         
@@ -458,6 +1978,29 @@ def recommend():
         except:
             return "An error occurred while processing your request", 500
 
+@app.route("/api/search")
+def search_api():
+    """Typed movie and TV matches for ?q=, best first"""
+    query = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+    results = [search_result(*match) for match in title_index.search(query, limit=limit)]
+    return jsonify(query=query, results=results)
+
+@app.route("/api/popular")
+def popular_api():
+    """Most viewed titles on this site: ?kind=movie|tv|person&period=day|week|month&limit="""
+    kind = request.args.get("kind", "movie")
+    period = request.args.get("period", "day")
+    if kind not in ('movie', 'tv', 'person') or period not in VIEW_PERIODS:
+        return jsonify({'success': False, 'message': 'Unknown kind or period'}), 400
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    catalog = {'movie': movie_catalog, 'tv': tv_catalog}.get(kind)
+    results = []
+    for item_id, views in view_counts.top(kind, VIEW_PERIODS[period], limit):
+        row = catalog.index_of(item_id) if catalog else None
+        results.append({**(catalog.row(row) if row is not None else {'id': item_id}), 'views': views})
+    return make_public(jsonify(kind=kind, period=period, results=results))
+
 @app.errorhandler(404)
 def page_not_found(e):
     try:
@@ -466,166 +2009,245 @@ def page_not_found(e):
         return "Page not found", 404
     
 @app.route('/movie/<int:movie_id>')
+@cached_page
 def movie_detail(movie_id):
-    # Get movie details and related movies
-    movie_details, related_movies = get_movie_info(movie_id)
+    # Only the core details are fetched here; cast, trailer, franchise,
+    # recommendations and providers are loaded by the page from /api/movie/...
+    movie_details = load_detail_section('movie', movie_id, 'details', get_movie_details)
     if not movie_details:
-        return render_template("404.html", message="Movie not found.")
-    
-    # Get trailer key
-    trailer_key = get_movie_trailer(movie_id)
+        return render_template("404.html", message="Movie not found."), 404
     
-    # Get credits
-    credits = get_movie_credits(movie_id)
-
-    # Add streaming providers
-    streaming_providers = get_movie_watch_providers(movie_id)
+    # The page asks for the franchise next; fetch it while the HTML goes out
+    collection = movie_details.get('belongs_to_collection')
+    if collection:
+        background.submit(get_collection_parts, collection['id'], key=f"collection:{collection['id']}")
     
-    # Get API-based similar movies
-    api_similar_movies = get_similar_movie(movie_id)
-    
-    # Get ML-based recommendations
-    ml_recommendations = []
-    if movie_details.get('title'):
-        # Try to find the movie in our dataset
-        titles = movie_df["title"].tolist()
-        closest_match = get_best_match(movie_details['title'], titles)
-        
-        if closest_match:
-            index_of_movie = movie_df[movie_df.title == closest_match].index.values[0]
-            similarity_scores = list(enumerate(movie_similarity[index_of_movie]))
-            sorted_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-            
-            # Get top 6 ML recommendations
-            titles_seen = set()
-            for i, _ in sorted_scores[1:12]:  # Get top 6 similar
-                movie = movie_df.iloc[i]
-                title = movie["title"]
-                if title == movie_details['title'] or title in titles_seen:
-                    continue
-                titles_seen.add(title)
-                ml_recommendations.append({
-                    "id": movie["id"],
-                    "title": title,
-                    "poster_path": movie["poster_path"],
-                    "release_date": movie.get("release_date", "")[:4] if movie.get("release_date") else "N/A"
-                })
-
-    movie_data = {
-        'details': movie_details,
-        'cast': credits.get('cast', []) if credits else [],
-        'crew': credits.get('crew', []) if credits else [],
-        'trailer_key': trailer_key,
-        'related_movies': related_movies,
-        'similar_movies': api_similar_movies,
-        'ml_recommendations': ml_recommendations
-    }
+    # Related TV comes from the local joint index, no TMDB call
+    related_tv = joint_index.neighbors('movie', movie_id) if joint_index else []
     
     return render_template("movie_detail.html", 
-                         movie=movie_data,
-                         streaming_providers=streaming_providers,
-                         img_url=TMDB_IMAGE_URL)
+                         movie={'details': movie_details, 'related_tv': related_tv})
 
 @app.route('/tv/<int:tv_id>')
+@cached_page
 def tv_detail(tv_id):
-    # Get TV show details
-    tv_details = get_tv_info(tv_id)
+    # Only the core details (including season summaries) are fetched here;
+    # the other sections are loaded by the page from /api/tv/...
+    tv_details = load_detail_section('tv', tv_id, 'show', get_tv_info)
     if not tv_details:
-        return render_template("404.html", message="TV show not found.")
+        return render_template("404.html", message="TV show not found."), 404
     
-    # Get trailer key
-    trailer_key = get_tv_trailer(tv_id)
+    seasons = tv_details.get('seasons', [])
+    latest_season = latest_season_number(seasons)
+    if SEASON_PREFETCH and latest_season is not None:
+        background.submit(get_tv_season, tv_id, latest_season, key=f"season:{tv_id}:{latest_season}")
     
-    # Get credits - ensure this includes IDs
-    credits = get_tv_credits(tv_id)
+    related_movies = joint_index.neighbors('tv', tv_id) if joint_index else []
     
-    # Get similar TV shows from API
-    api_similar = get_similar_tv(tv_id)
+    return render_template("tv_detail.html", 
+                         tv={'show': tv_details, 'seasons': seasons, 'latest_season': latest_season,
+                             'related_movies': related_movies})
+
+# ------------- Detail page sections (JSON) -------------
+
+def has_credits(credits):
+    return bool(credits and (credits.get('cast') or credits.get('crew')))
+
+@app.route('/api/movie/<int:movie_id>/credits')
+def movie_credits_api(movie_id):
+    credits = load_detail_section('movie', movie_id, 'credits', get_movie_credits, valid=has_credits)
+    credits = credits or {'cast': [], 'crew': []}
+    return jsonify(cast=credits['cast'], crew=credits['crew'],
+                   html=render_template("partials/movie_credits.html", movie=credits))
+
+@app.route('/api/movie/<int:movie_id>/trailer')
+def movie_trailer_api(movie_id):
+    return jsonify(trailer_key=load_detail_section('movie', movie_id, 'trailer_key', get_movie_trailer))
+
+@app.route('/api/movie/<int:movie_id>/related')
+def movie_related_api(movie_id):
+    related = load_detail_section('movie', movie_id, 'related_movies', lambda i: get_movie_info(i)[1]) or []
+    return jsonify(results=related,
+                   html=render_template("partials/movie_related.html", movie={'related_movies': related}))
+
+@app.route('/api/movie/<int:movie_id>/similar')
+def movie_similar_api(movie_id):
+    return jsonify(results=load_detail_section('movie', movie_id, 'similar', get_similar_movie) or [])
+
+@app.route('/api/movie/<int:movie_id>/recommendations')
+def movie_recommendations_api(movie_id):
+    title = None
+    if movie_catalog.index_of(movie_id) is None:
+        # Not in the dataset: fall back to matching the TMDB title
+        movie_details = load_detail_section('movie', movie_id, 'details', get_movie_details)
+        title = (movie_details or {}).get('title')
+    recs = get_movie_ml_recommendations(movie_id, title)
+    return jsonify(results=recs,
+                   html=render_template("partials/movie_recommendations.html", movie={'ml_recommendations': recs}))
+
+@app.route('/api/movie/<int:movie_id>/providers')
+def movie_providers_api(movie_id):
+    region = request.args.get('region', '').upper()
+    if region and region not in PROVIDER_REGIONS:
+        return jsonify(error=f"region must be one of {', '.join(PROVIDER_REGIONS)}"), 400
+    if region:
+        providers = get_movie_watch_providers(movie_id, region=region)
+    else:
+        providers = load_detail_section('movie', movie_id, 'streaming_providers', get_movie_watch_providers)
+    movie_details = load_detail_section('movie', movie_id, 'details', get_movie_details) or {}
+    return jsonify(region=providers['region'] if providers else region or 'IN', providers=providers,
+                   html=render_template("partials/movie_providers.html",
+                                        movie={'details': movie_details, 'streaming_providers': providers},
+                                        regions=PROVIDER_REGIONS))
+
+@app.route('/api/tv/<int:tv_id>/credits')
+def tv_credits_api(tv_id):
+    credits = load_detail_section('tv', tv_id, 'credits', get_tv_credits, valid=has_credits)
+    credits = credits or {'cast': [], 'crew': []}
+    return jsonify(cast=credits['cast'], crew=credits['crew'],
+                   html=render_template("partials/tv_credits.html", tv=credits))
+
+@app.route('/api/tv/<int:tv_id>/trailer')
+def tv_trailer_api(tv_id):
+    return jsonify(trailer_key=load_detail_section('tv', tv_id, 'trailer_key', get_tv_trailer))
+
+@app.route('/api/tv/<int:tv_id>/similar')
+def tv_similar_api(tv_id):
+    return jsonify(results=load_detail_section('tv', tv_id, 'similar', get_similar_tv) or [])
+
+@app.route('/api/tv/<int:tv_id>/recommendations')
+def tv_recommendations_api(tv_id):
+    name = None
+    if tv_catalog.index_of(tv_id) is None:
+        tv_details = load_detail_section('tv', tv_id, 'show', get_tv_info)
+        name = (tv_details or {}).get('name')
+    recs = get_tv_ml_recommendations(tv_id, name)
+    return jsonify(results=recs,
+                   html=render_template("partials/tv_recommendations.html", tv={'ml_recommendations': recs}))
+
+@app.route('/api/tv/<int:tv_id>/providers')
+def tv_providers_api(tv_id):
+    region = request.args.get('region', '').upper()
+    if region and region not in PROVIDER_REGIONS:
+        return jsonify(error=f"region must be one of {', '.join(PROVIDER_REGIONS)}"), 400
+    if region:
+        providers = get_tv_watch_providers(tv_id, region=region)
+    else:
+        providers = load_detail_section('tv', tv_id, 'streaming_providers', get_tv_watch_providers)
+    return jsonify(region=region or 'US', providers=providers)
+
+@app.route('/api/tv/<int:tv_id>/season/<int:season_number>')
+def tv_season_api(tv_id, season_number):
+    season = get_tv_season(tv_id, season_number)
+    if not season:
+        return jsonify(error="Season not found"), 404
+    return jsonify(season=season, html=render_template("partials/tv_season.html", season=season))
+
+@app.route('/api/tv/<int:tv_id>/seasons')
+def tv_seasons_api(tv_id):
+    """Batch form of tv_season_api: ?numbers=1,2,3"""
+    try:
+        numbers = sorted({int(n) for n in request.args.get('numbers', '').split(',') if n.strip()})
+    except ValueError:
+        return jsonify(error="numbers must be a comma separated list of season numbers"), 400
+    if len(numbers) > SEASON_BATCH_SIZE:
+        return jsonify(error=f"at most {SEASON_BATCH_SIZE} seasons per request"), 400
+    seasons = get_tv_seasons(tv_id, numbers)
+    return jsonify(seasons={str(number): season for number, season in seasons.items()})
 
-    # Get ML-based recommendations
-    ml_recommendations = []
-    if tv_details.get('name'):
-        # Try to find the TV show in our dataset
-        title_column = "name" if "name" in tv_df.columns else "title"
-        titles = tv_df[title_column].tolist()
-        closest_match = get_best_match(tv_details['name'], titles)
-        
-        if closest_match:
-            index_of_tv = tv_df[tv_df[title_column] == closest_match].index.values[0]
-            similarity_scores = list(enumerate(tv_similarity[index_of_tv]))
-            sorted_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-            
-            # Get top 6 ML recommendations
-            titles_seen = set()
-            for i, _ in sorted_scores[1:12]:  # Get top 6 similar
-                tv = tv_df.iloc[i]
-                title = tv[title_column]
-                if title == tv_details['name'] or title in titles_seen:
-                    continue
-                titles_seen.add(title)
-                ml_recommendations.append({
-                    "id": tv["id"],
-                    "name": title,
-                    "poster_path": tv["poster_path"],
-                    "first_air_date": tv.get("first_air_date", "")[:4] if tv.get("first_air_date") else "N/A"
-                })
-
-    # Add streaming providers
-    streaming_providers = get_tv_watch_providers(tv_id)
-    
-    tv_data = {
-        'show': tv_details,
-        'cast': [{
-            'id': person.get('id'),
-            'name': person.get('name'),
-            'character': person.get('character'),
-            'profile_path': person.get('profile_path')
-        } for person in credits.get('cast', [])[:10]] if credits else [],
-        'crew': [{
-            'id': person.get('id'),
-            'name': person.get('name'),
-            'job': person.get('job'),
-            'profile_path': person.get('profile_path')
-        } for person in credits.get('crew', []) if person.get('job') in ['Director', 'Screenplay', 'Writer', 'Producer']],
-        'trailer_key': trailer_key,
-        'similar': api_similar,
-        'ml_recommendations': ml_recommendations,
-        'seasons': tv_details.get('seasons', [])
+def get_credit_year(credit):
+    if 'release_date' in credit and credit['release_date']:
+        return credit['release_date'][:4]
+    elif 'first_air_date' in credit and credit['first_air_date']:
+        return credit['first_air_date'][:4]
+    return '0000'
+
+app.jinja_env.filters['get_credit_year'] = get_credit_year
+
+PERSON_CREDITS_PAGE_SIZE = 40
+
+def normalize_person_credits(combined_credits):
+    """
+    Acting credits for the person page: one entry per title (characters of
+    repeat roles merged), newest first with undated credits last.
+    """
+    credits = {}
+    for credit in combined_credits.get('cast', []):
+        key = (credit.get('media_type'), credit.get('id'))
+        entry = credits.get(key)
+        if entry is None:
+            credits[key] = {
+                'id': credit.get('id'),
+                'media_type': credit.get('media_type'),
+                'title': credit.get('title') or credit.get('name'),
+                'characters': [credit['character']] if credit.get('character') else [],
+                'date': credit.get('release_date') or credit.get('first_air_date') or '',
+                'year': get_credit_year(credit),
+                'poster_path': credit.get('poster_path'),
+                'popularity': credit.get('popularity', 0),
+            }
+        elif credit.get('character') and credit['character'] not in entry['characters']:
+            entry['characters'].append(credit['character'])
+    entries = sorted(credits.values(), key=lambda c: c['date'], reverse=True)
+    for entry in entries:
+        entry['character'] = ' / '.join(entry.pop('characters'))
+    return entries
+
+@tmdb_cached()
+def get_person_credits(person_id):
+    """Normalized credits and top "known for" titles, built once per person"""
+    person_data = load_detail_bundle('person', person_id)
+    if not person_data:
+        return None
+    cast = normalize_person_credits(person_data.get('combined_credits') or {})
+    known_for = sorted(cast, key=lambda c: c['popularity'], reverse=True)[:4]
+    credits = {'cast': cast, 'known_for': known_for}
+    # Built from a snapshot/catalog stand-in: use it for this request only
+    return Uncached(credits) if g.get('degraded') else credits
+
+def person_credits_page(person_id, page):
+    credits = get_person_credits(person_id)
+    if credits is None:
+        return None
+    total = len(credits['cast'])
+    start = (page - 1) * PERSON_CREDITS_PAGE_SIZE
+    return {
+        'page': page,
+        'total_results': total,
+        'total_pages': max(1, -(-total // PERSON_CREDITS_PAGE_SIZE)),
+        'results': credits['cast'][start:start + PERSON_CREDITS_PAGE_SIZE],
     }
-    
-    return render_template("tv_detail.html", 
-                         tv=tv_data,
-                         streaming_providers=streaming_providers,
-                         img_url=TMDB_IMAGE_URL)
 
 @app.route('/person/<int:person_id>')
+@cached_page
 def person_detail(person_id):
-    # Fetch person details from TMDB API
-    url = f"https://api.themoviedb.org/3/person/{person_id}?api_key={TMDB_API_KEY}&append_to_response=combined_credits,images"
-    response = requests.get(url)
+    # Fetch person details from TMDB API (or the local snapshot)
+    person_data = load_detail_bundle('person', person_id)
     
-    if response.status_code != 200:
-        return render_template("404.html", message="Person not found")
+    if not person_data:
+        return render_template("404.html", message="Person not found"), 404
     
-    person_data = response.json()
-    
-    # Get known for works (top 4 most popular)
-    known_for = sorted(
-        person_data.get('combined_credits', {}).get('cast', []),
-        key=lambda x: x.get('popularity', 0),
-        reverse=True
-    )[:4]
+    # Only the first page of credits is rendered; the rest come from the API
+    person_data = {k: v for k, v in person_data.items() if k != 'combined_credits'}
+    credits = get_person_credits(person_id)
     
     return render_template(
         "person_detail.html",
         cast={
             **person_data,
-            "known_for": known_for,
-            "combined_credits": person_data.get('combined_credits', {})
-        },
-        img_url=TMDB_IMAGE_URL
+            "known_for": credits['known_for'],
+            "credits": person_credits_page(person_id, 1)
+        }
     )
 
+@app.route('/api/person/<int:person_id>/credits')
+def person_credits_api(person_id):
+    page = max(request.args.get('page', 1, type=int), 1)
+    credits = person_credits_page(person_id, page)
+    if credits is None:
+        return jsonify(error="Person not found"), 404
+    return jsonify(**credits, html=render_template("partials/person_credits.html", credits=credits['results']))
+
 def calculate_age(birthdate):
     """Calculate age from birthdate string (YYYY-MM-DD)"""
     if not birthdate:
@@ -636,16 +2258,8 @@ def calculate_age(birthdate):
 
 app.jinja_env.globals.update(calculate_age=calculate_age)
 
-def get_credit_year(credit):
-    if 'release_date' in credit and credit['release_date']:
-        return credit['release_date'][:4]
-    elif 'first_air_date' in credit and credit['first_air_date']:
-        return credit['first_air_date'][:4]
-    return '0000'
-
-app.jinja_env.filters['get_credit_year'] = get_credit_year
-
 @app.route('/genre/<content_type>/<int:genre_id>')
+@cached_page
 def genre_content(content_type, genre_id):
     genres_dict = get_genres_dict()
     
@@ -659,10 +2273,10 @@ def genre_content(content_type, genre_id):
         genre_name = genre_info['name'] if genre_info else None
         movie_genre_ids = genre_info['movie_match'] if genre_info else []
     else:
-        return render_template("404.html", message="Invalid content type")
+        return render_template("404.html", message="Invalid content type"), 404
     
     if not genre_name:
-        return render_template("404.html", message="Genre not found")
+        return render_template("404.html", message="Genre not found"), 404
     
     # Fetch content
     movies = []
@@ -670,11 +2284,11 @@ def genre_content(content_type, genre_id):
     
     if content_type == 'movie':
         # Get movies from this genre
-        movies = fetch_movies_by_category("popular", genre_id=genre_id)
+        movies = fetch_listing(fetch_movies_by_category, "popular", genre_id=genre_id)
         
         # Get TV shows from matching genres
         for tv_genre_id in tv_genre_ids:
-            shows = fetch_tv_by_category("popular", genre_id=tv_genre_id)
+            shows = fetch_listing(fetch_tv_by_category, "popular", genre_id=tv_genre_id)
             tv_shows.extend(shows)
             
         # If still no TV shows, try to find similar genres
@@ -682,16 +2296,16 @@ def genre_content(content_type, genre_id):
             similar_tv_genres = [gid for gid, info in genres_dict['tv'].items() 
                                if genre_name.lower() in info['name'].lower()]
             for tv_genre_id in similar_tv_genres:
-                shows = fetch_tv_by_category("popular", genre_id=tv_genre_id)
+                shows = fetch_listing(fetch_tv_by_category, "popular", genre_id=tv_genre_id)
                 tv_shows.extend(shows)
                 
     else:  # content_type == 'tv'
         # Get TV shows from this genre
-        tv_shows = fetch_tv_by_category("popular", genre_id=genre_id)
+        tv_shows = fetch_listing(fetch_tv_by_category, "popular", genre_id=genre_id)
         
         # Get movies from matching genres
         for movie_genre_id in movie_genre_ids:
-            films = fetch_movies_by_category("popular", genre_id=movie_genre_id)
+            films = fetch_listing(fetch_movies_by_category, "popular", genre_id=movie_genre_id)
             movies.extend(films)
             
         # If still no movies, try to find similar genres
@@ -699,7 +2313,7 @@ def genre_content(content_type, genre_id):
             similar_movie_genres = [gid for gid, info in genres_dict['movies'].items() 
                                    if genre_name.lower() in info['name'].lower()]
             for movie_genre_id in similar_movie_genres:
-                films = fetch_movies_by_category("popular", genre_id=movie_genre_id)
+                films = fetch_listing(fetch_movies_by_category, "popular", genre_id=movie_genre_id)
                 movies.extend(films)
     
     # Remove duplicates
@@ -709,16 +2323,15 @@ def genre_content(content_type, genre_id):
     return render_template("genre.html",
                          genre_name=genre_name,
                          movies=movies[:20],
-                         tv_shows=tv_shows[:20],
-                         img_url=TMDB_IMAGE_URL)
+                         tv_shows=tv_shows[:20])
 
-@lru_cache(maxsize=128)
+@tmdb_cached(cache_if=lambda providers: True)
 def get_movie_watch_providers(movie_id, region='IN'):
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}/watch/providers"
+    url = f"{TMDB_API_URL}/movie/{movie_id}/watch/providers"
     headers = {"Authorization": f"Bearer {TMDB_API_KEY}"}
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = tmdb_get(url, headers=headers, timeout=TMDB_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -747,14 +2360,20 @@ def get_movie_watch_providers(movie_id, region='IN'):
         
     except Exception as e:
         print(f"Error fetching providers: {e}")
-        return None
+        return Uncached()
     
 
+PROVIDER_REGIONS = ['IN', 'US', 'GB', 'AU', 'CA']
+
 @app.route('/movie/<int:movie_id>/refresh_providers')
 def refresh_providers(movie_id):
-    region = request.args.get('region', 'US')
-    # Clear the cache for this movie
-    get_movie_watch_providers.cache_clear()
+    # Same default as get_movie_watch_providers, so a bare refresh drops the
+    # entry the detail page reads
+    region = request.args.get('region', 'IN').upper()
+    if region not in PROVIDER_REGIONS:
+        return jsonify({'success': False, 'message': f"region must be one of {', '.join(PROVIDER_REGIONS)}"}), 400
+    # Drop the cached entry for this movie and region
+    get_movie_watch_providers.invalidate(movie_id, region=region)
     # Get fresh data with new region
     providers = get_movie_watch_providers(movie_id, region=region)
     return jsonify({
@@ -763,49 +2382,50 @@ def refresh_providers(movie_id):
         'has_providers': providers is not None
     })
 
-def get_tv_watch_providers(tv_id):
+@tmdb_cached(cache_if=lambda providers: True)
+def get_tv_watch_providers(tv_id, region='US'):
     """
     Get streaming providers for a TV show
     Returns same structure as get_movie_watch_providers
     """
-    url = f"https://api.themoviedb.org/3/tv/{tv_id}/watch/providers"
+    url = f"{TMDB_API_URL}/tv/{tv_id}/watch/providers"
     headers = {
         "Authorization": f"Bearer {TMDB_API_KEY}",
         "accept": "application/json"
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = tmdb_get(url, headers=headers, timeout=TMDB_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
-        if 'results' in data and 'US' in data['results']:
-            us_providers = data['results']['US']
+        if 'results' in data and region in data['results']:
+            region_providers = data['results'][region]
             providers_data = {
                 "link": f"https://www.themoviedb.org/tv/{tv_id}/watch"
             }
             
-            if 'flatrate' in us_providers:
+            if 'flatrate' in region_providers:
                 providers_data['flatrate'] = [
                     {
                         "provider_name": p['provider_name'],
                         "provider_id": p['provider_id']
-                    } for p in us_providers['flatrate']
+                    } for p in region_providers['flatrate']
                 ]
             
-            if 'buy' in us_providers:
+            if 'buy' in region_providers:
                 providers_data['buy'] = [
                     {
                         "provider_name": p['provider_name'],
                         "provider_id": p['provider_id']
-                    } for p in us_providers['buy']
+                    } for p in region_providers['buy']
                 ]
             
             return providers_data if any(k in providers_data for k in ['flatrate', 'buy']) else None
             
     except requests.exceptions.RequestException as e:
         print(f"Error fetching TV watch providers: {e}")
-        return None
+        return Uncached()
     
 class User(UserMixin):
     def __init__(self, id_, name, email, profile_pic):
@@ -814,10 +2434,35 @@ class User(UserMixin):
         self.email = email
         self.profile_pic = profile_pic
 
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+USER_CACHE_MAX = 10000
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+def invalidate_user_cache(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
 @login_manager.user_loader
 def load_user(user_id):
-    # Here you would typically query your database for the user
-    return User.get(user_id)
+    # Authenticated requests reuse a recently loaded user instead of hitting
+    # the DB each time; entries are dropped on any update to the user row
+    cached = _user_cache.get(user_id)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    user = User.get(user_id)
+    if user is not None:
+        # Detach so commits in later requests can't expire its attributes
+        db.session.expunge(user)
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_MAX:
+                now = time.time()
+                for key in [k for k, (_, expires) in _user_cache.items() if expires <= now]:
+                    del _user_cache[key]
+                if len(_user_cache) >= USER_CACHE_MAX:
+                    _user_cache.clear()
+            _user_cache[user_id] = (user, time.time() + USER_CACHE_TTL)
+    return user
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -844,7 +2489,7 @@ def login_google():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     
-    google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
+    google_provider_cfg = get_google_provider_cfg()
     authorization_endpoint = google_provider_cfg["authorization_endpoint"]
     
     request_uri = client.prepare_request_uri(
@@ -867,7 +2512,7 @@ def auth_callback():
     
     try:
         # Get token endpoint
-        google_provider_cfg = requests.get(GOOGLE_DISCOVERY_URL).json()
+        google_provider_cfg = get_google_provider_cfg()
         token_endpoint = google_provider_cfg["token_endpoint"]
         
         # Prepare token request
@@ -877,11 +2522,12 @@ def auth_callback():
             redirect_url=request.base_url,
             code=code
         )
-        token_response = requests.post(
+        token_response = auth_session.post(
             token_url,
             headers=headers,
             data=body,
             auth=(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET),
+            timeout=AUTH_TIMEOUT,
         )
         
         # Parse tokens
@@ -890,7 +2536,7 @@ def auth_callback():
         # Get userinfo
         userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
         uri, headers, body = client.add_token(userinfo_endpoint)
-        userinfo_response = requests.get(uri, headers=headers, data=body)
+        userinfo_response = auth_session.get(uri, headers=headers, data=body, timeout=AUTH_TIMEOUT)
         
         if userinfo_response.status_code != 200:
             return render_template("404.html", message="Failed to fetch user info"), 400
@@ -984,6 +2630,11 @@ class User(UserMixin, db.Model):
         db.session.commit()
         return user
 
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def drop_cached_user(mapper, connection, target):
+    invalidate_user_cache(target.id)
+
 # Create tables
 with app.app_context():
     db.create_all()
@@ -1062,46 +2713,127 @@ class WatchlistItem(db.Model):
         if item:
             db.session.delete(item)
             db.session.commit()
+            invalidate_watchlist_membership(user_id)
             return True
         return False
 
+# ------------- Watchlist membership -------------
+
+WATCHLIST_MEMBERSHIP_TTL = int(os.environ.get("WATCHLIST_MEMBERSHIP_TTL", 3600))
+WATCHLIST_CONTAINS_MAX = 200
+
+def watchlist_version(user_id):
+    """Token naming the current cached membership set; replaced on every write"""
+    key = f"watchlist-version:{user_id}"
+    version = cache_read(key)
+    if version is MISSING:
+        version = uuid.uuid4().hex
+        cache_write(key, version, WATCHLIST_MEMBERSHIP_TTL)
+    return version
+
+def watchlist_membership(user_id):
+    """
+    Set of (item_type, item_id) on a user's watchlist, for display only.
+    Kept in the shared cache so every worker sees the same copy, and
+    remembered for the rest of the request. The set is stored under the
+    version read *before* querying the DB, so a request that loses a race
+    with a write leaves its stale copy under a version nobody reads again.
+    """
+    memo = g.setdefault('watchlist_membership', {})
+    if user_id in memo:
+        return memo[user_id]
+    key = f"watchlist:{user_id}:{watchlist_version(user_id)}"
+    members = cache_read(key)
+    if members is MISSING:
+        members = [[item_type, item_id] for item_type, item_id in db.session.execute(
+            db.select(WatchlistItem.item_type, WatchlistItem.item_id).where(WatchlistItem.user_id == user_id))]
+        cache_write(key, members, WATCHLIST_MEMBERSHIP_TTL)
+    memo[user_id] = {(item_type, int(item_id)) for item_type, item_id in members}
+    return memo[user_id]
+
+def invalidate_watchlist_membership(user_id):
+    """
+    Call after the write has committed. Best effort: the write already
+    succeeded, so a cache outage here is logged rather than failing the
+    request (saved-state markers may then lag until the TTL runs out).
+    """
+    g.get('watchlist_membership', {}).pop(user_id, None)
+    try:
+        tmdb_cache.set(f"watchlist-version:{user_id}", uuid.uuid4().hex, WATCHLIST_MEMBERSHIP_TTL)
+    except Exception as e:
+        app.logger.warning(f"Could not invalidate watchlist membership for {user_id}: {e}")
+
+@app.context_processor
+def inject_watchlist_membership():
+    def in_watchlist(item_type, item_id):
+        # Cached public pages are rendered anonymously; the browser asks
+        # /api/watchlist/contains instead
+        if g.get('public_page') or not current_user.is_authenticated:
+            return False
+        return (item_type, int(item_id)) in watchlist_membership(current_user.id)
+    return {'in_watchlist': in_watchlist}
+
+@app.route('/api/watchlist/contains', methods=['GET', 'POST'])
+def watchlist_contains():
+    """
+    Saved state for many titles at once: POST {"items": ["movie:603", "tv:1399"]}
+    or GET ?items=movie:603,tv:1399. Answers {"items": {"movie:603": true, ...}}.
+    """
+    if not current_user.is_authenticated:
+        return jsonify({'success': False, 'message': 'Please log in first'}), 401
+    if request.method == 'POST':
+        keys = (request.get_json(silent=True) or {}).get('items') or []
+    else:
+        keys = [key for key in request.args.get('items', '').split(',') if key]
+    if not isinstance(keys, list) or len(keys) > WATCHLIST_CONTAINS_MAX:
+        return jsonify({'success': False, 'message': f"Send a list of at most {WATCHLIST_CONTAINS_MAX} items"}), 400
+    members = watchlist_membership(current_user.id)
+    items = {}
+    for key in keys:
+        item_type, _, item_id = str(key).partition(':')
+        items[str(key)] = item_id.isdigit() and (item_type, int(item_id)) in members
+    return jsonify({'success': True, 'items': items})
+
 @app.route('/add_to_watchlist', methods=['POST'])
 @login_required
 def add_to_watchlist():
     if not current_user.is_authenticated:
         return jsonify({'success': False, 'message': 'Please log in first'}), 401
     
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+    item_id = str(data.get('item_id', ''))
+    if data.get('item_type') not in ('movie', 'tv') or not item_id.isdigit() or not data.get('title'):
+        return jsonify({'success': False, 'message': 'Missing or invalid item'}), 400
     
-    # Check if item already exists in watchlist
+    # Check if item already exists in watchlist (the DB, not the display cache)
     existing = WatchlistItem.query.filter_by(
         user_id=current_user.id,
-        item_id=data['item_id'],
+        item_id=int(item_id),
         item_type=data['item_type']
     ).first()
-    
     if existing:
         return jsonify({'success': False, 'message': 'Already in your watchlist'})
     
     # Add new item
     new_item = WatchlistItem(
         user_id=current_user.id,
-        item_id=data['item_id'],
+        item_id=int(item_id),
         item_type=data['item_type'],
         title=data['title'],
-        poster_path=data['poster_path']
+        poster_path=data.get('poster_path')
     )
     
     db.session.add(new_item)
     db.session.commit()
+    invalidate_watchlist_membership(current_user.id)
     
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'id': new_item.id})
 
 @app.route('/watchlist')
 @login_required
 def watchlist():
     items = WatchlistItem.query.filter_by(user_id=current_user.id).order_by(WatchlistItem.added_on.desc()).all()
-    return render_template('watchlist.html', items=items, img_url=TMDB_IMAGE_URL)
+    return render_template('watchlist.html', items=items)
 
 @app.route('/remove_from_watchlist', methods=['POST'])
 @login_required
@@ -1124,9 +2856,552 @@ def remove_from_watchlist():
     if item:
         db.session.delete(item)
         db.session.commit()
+        invalidate_watchlist_membership(current_user.id)
         return jsonify({'success': True})
     
     return jsonify({'success': False, 'message': 'Item not found'}), 404
 
+# ------------- Watchlist export / import -------------
+
+WATCHLIST_EXPORT_FIELDS = ['item_type', 'item_id', 'title', 'poster_path', 'added_on']
+WATCHLIST_IMPORT_MAX = int(os.environ.get("WATCHLIST_IMPORT_MAX", 10000))
+WATCHLIST_IMPORT_BATCH = 500
+IMPORT_TYPES = {'movie': 'movie', 'film': 'movie', 'tv': 'tv', 'show': 'tv', 'series': 'tv'}
+
+@app.route('/watchlist/export')
+@login_required
+def export_watchlist():
+    """The user's watchlist as CSV (default) or JSON lines (?format=jsonl), streamed"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'message': 'format must be csv or jsonl'}), 400
+    query = (db.select(*(getattr(WatchlistItem, field) for field in WATCHLIST_EXPORT_FIELDS))
+             .where(WatchlistItem.user_id == current_user.id)
+             .order_by(WatchlistItem.added_on.desc())
+             .execution_options(yield_per=WATCHLIST_IMPORT_BATCH))
+
+    def records():
+        # yield_per keeps only one batch of rows in memory at a time
+        for partition in db.session.execute(query).partitions():
+            yield [dict(row._mapping, added_on=row.added_on.isoformat() if row.added_on else None)
+                   for row in partition]
+
+    def generate():
+        if export_format == 'jsonl':
+            for batch in records():
+                yield ''.join(json.dumps(record) + '\n' for record in batch)
+            return
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=WATCHLIST_EXPORT_FIELDS)
+        writer.writeheader()
+        for batch in records():
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    response = app.response_class(stream_with_context(generate()),
+                                  mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="watchlist.{export_format}"'
+    response.cache_control.no_store = True
+    return response
+
+def read_import_records(stream, import_format):
+    """Dicts from an uploaded CSV or JSON-lines stream, read line by line"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {}
+
+def import_fields(record):
+    """(item_type, item_id, title, year, poster_path) from one import record"""
+    def value(*names):
+        for name in names:
+            if record.get(name) not in (None, ''):
+                return str(record[name]).strip()
+        return None
+    item_id = value('item_id', 'tmdb_id', 'id')
+    return (IMPORT_TYPES.get((value('item_type', 'type', 'media_type') or '').lower()),
+            int(item_id) if item_id and item_id.isdigit() else None,
+            value('title', 'name'),
+            (value('year', 'release_date', 'first_air_date') or '')[:4] or None,
+            value('poster_path'))
+
+def resolve_import_batch(records):
+    """
+    Watchlist columns for each record, or None when it can't be matched.
+    Records with a type and an id are taken as they are; the rest are
+    matched by title against the local catalogs in one pass.
+    """
+    parsed = [import_fields(record) for record in records]
+    resolved = [None] * len(records)
+
+    def from_catalog(kind, row):
+        catalog = title_index.catalogs[kind]
+        item = catalog.row(row)
+        return {'item_type': kind, 'item_id': item['id'], 'title': item[catalog.title_key][:200],
+                'poster_path': item['poster_path']}
+
+    lookups = []
+    for n, (kind, item_id, title, year, poster_path) in enumerate(parsed):
+        if kind and item_id is not None:
+            row = title_index.catalogs[kind].index_of(item_id)
+            if row is not None:
+                resolved[n] = from_catalog(kind, row)
+            elif title:
+                resolved[n] = {'item_type': kind, 'item_id': item_id, 'title': title[:200],
+                               'poster_path': poster_path}
+        elif title:
+            lookups.append((n, (title, kind, year)))
+    matches = title_index.match_many([query for _, query in lookups])
+    for (n, _), match in zip(lookups, matches):
+        if match:
+            resolved[n] = from_catalog(*match)
+    return resolved
+
+@app.route('/watchlist/import', methods=['POST'])
+@login_required
+def import_watchlist():
+    """
+    Add many titles at once from an uploaded CSV or JSON-lines file (or the
+    raw request body). Records need a title, or an item_type plus TMDB id;
+    titles already on the watchlist are skipped. Everything is inserted in
+    one transaction.
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename or '') if upload else ''
+    import_format = request.args.get('format') or (
+        'jsonl' if filename.endswith(('.jsonl', '.ndjson')) or request.mimetype == 'application/x-ndjson' else 'csv')
+    if import_format not in ('csv', 'jsonl'):
+        return jsonify({'success': False, 'message': 'format must be csv or jsonl'}), 400
+
+    user_id = current_user.id
+    existing = {tuple(row) for row in db.session.execute(
+        db.select(WatchlistItem.item_type, WatchlistItem.item_id).where(WatchlistItem.user_id == user_id))}
+    added_on = datetime.utcnow()
+    counts = {'imported': 0, 'already_listed': 0, 'unresolved': 0}
+    unresolved = []
+
+    def insert(batch):
+        rows = []
+        for record, item in zip(batch, resolve_import_batch(batch)):
+            if item is None:
+                counts['unresolved'] += 1
+                if len(unresolved) < 20:
+                    unresolved.append(record)
+                continue
+            key = (item['item_type'], item['item_id'])
+            if key in existing:
+                counts['already_listed'] += 1
+                continue
+            existing.add(key)
+            rows.append({**item, 'user_id': user_id, 'added_on': added_on})
+        if rows:
+            db.session.execute(db.insert(WatchlistItem), rows)
+            counts['imported'] += len(rows)
+
+    truncated = False
+    try:
+        batch = []
+        for n, record in enumerate(read_import_records(stream, import_format)):
+            if n >= WATCHLIST_IMPORT_MAX:
+                truncated = True
+                break
+            batch.append(record)
+            if len(batch) == WATCHLIST_IMPORT_BATCH:
+                insert(batch)
+                batch = []
+        insert(batch)
+        db.session.commit()
+        if counts['imported']:
+            invalidate_watchlist_membership(user_id)
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f"Could not read the file: {e}"}), 400
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return jsonify({'success': True, **counts, 'truncated': truncated, 'unresolved_sample': unresolved})
+
+# ------------- Request profiling -------------
+
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(app.instance_path, 'profiles')
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(',') if email.strip()}
+
+def is_admin():
+    return current_user.is_authenticated and (current_user.email or '').lower() in ADMIN_EMAILS
+
+def admin_required(view):
+    """Admin pages look like any other missing page to everyone else"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+def profile_reason():
+    """Why this request should be profiled, or None"""
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    if (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1') and is_admin():
+        return 'admin'
+    return None
+
+def save_profile(profiler, meta):
+    """
+    Store cProfile stats (<name>.prof, loadable with pstats, snakeviz or
+    flameprof) plus a <name>.json summary. The directory is a ring buffer:
+    only the newest PROFILE_KEEP profiles are kept.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{int(meta['started'] * 1000)}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+    with open(os.path.join(PROFILE_DIR, f"{name}.json"), 'w') as f:
+        json.dump(meta, f)
+    names = sorted(n[:-len('.json')] for n in os.listdir(PROFILE_DIR) if n.endswith('.json'))
+    for old in names[:-PROFILE_KEEP]:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old + ext))
+            except FileNotFoundError:
+                pass  # pruned by another worker
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILE_DIR):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, filename)) as f:
+                profiles.append({'name': filename[:-len('.json')], **json.load(f)})
+        except (OSError, ValueError):
+            continue  # half-written or just pruned
+    return profiles
+
+# The hooks only exist when profiling is switched on, so a normal
+# deployment pays nothing for them
+if PROFILE_REQUESTS:
+    @app.before_request
+    def start_profile():
+        reason = profile_reason()
+        if reason:
+            g.profile_reason = reason
+            g.profile_started = time.time()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        meta = {
+            'started': g.profile_started,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'reason': g.profile_reason,
+        }
+
+        # Streamed pages keep rendering after this hook; stop once the body is sent
+        def stop():
+            profiler.disable()
+            meta['duration_ms'] = round((time.time() - meta['started']) * 1000, 1)
+            try:
+                save_profile(profiler, meta)
+            except OSError as e:
+                app.logger.warning(f"Could not save request profile: {e}")
+
+        response.call_on_close(stop)
+        return response
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    """Recent profiles, newest first (?sort=duration for slowest first, ?endpoint= to filter)"""
+    profiles = list_profiles()
+    endpoint = request.args.get('endpoint')
+    if endpoint:
+        profiles = [p for p in profiles if p.get('endpoint') == endpoint]
+    if request.args.get('sort') == 'duration':
+        profiles.sort(key=lambda p: p.get('duration_ms', 0), reverse=True)
+    else:
+        profiles.sort(key=lambda p: p['name'], reverse=True)
+    for profile in profiles:
+        profile['url'] = url_for('admin_profile', name=profile['name'])
+    return jsonify(enabled=PROFILE_REQUESTS, sample_rate=PROFILE_SAMPLE_RATE, profiles=profiles)
+
+@app.route('/admin/profiles/<name>')
+@admin_required
+def admin_profile(name):
+    """Top functions by cumulative time as text, or the raw .prof with ?download=1"""
+    if not re.fullmatch(r'[0-9]+-[0-9a-f]+', name):
+        abort(404)
+    path = os.path.join(PROFILE_DIR, f"{name}.prof")
+    if not os.path.exists(path):
+        abort(404)
+    if request.args.get('download') == '1':
+        return send_file(path, as_attachment=True, download_name=f"{name}.prof")
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(60)
+    return app.response_class(out.getvalue(), mimetype='text/plain')
+
+@app.route('/admin/tasks')
+@admin_required
+def admin_tasks():
+    """Background executor queue length, outcome counts and per-task latency for this worker"""
+    return jsonify(pid=os.getpid(), **background.stats())
+
+# ------------- Cache warming -------------
+
+class RateLimiter:
+    """
+    Token bucket shared by worker threads; rate is calls per second (0 for
+    no limit). Also holds every caller back while TMDB's Retry-After runs.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, cost=1):
+        with self._lock:
+            now = time.monotonic()
+            # TMDB answered 429: everyone waits out its Retry-After first
+            self._next = max(self._next, _tmdb_backoff['until'])
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval * cost
+        if delay > 0:
+            time.sleep(delay)
+
+def warm_title(kind, item_id, limiter, cast_limit=5):
+    """
+    Fetch everything a detail page needs for one title so it lands in the
+    TMDB cache. Returns the names of the calls that came back empty.
+    """
+    def fetch(func, *args):
+        limiter.wait()
+        return func(*args)
+
+    def call(func, *args):
+        result = fetch(func, *args)
+        if not result:
+            failed.append(func.__name__)
+        return result
+
+    failed = []
+    if kind == 'movie':
+        details, _ = fetch(get_movie_info, item_id)
+        if not details:
+            return ['get_movie_info']
+        credits = call(get_movie_credits, item_id)
+        call(get_similar_movie, item_id)
+        # No trailer or no providers is a valid (and cached) answer
+        fetch(get_movie_trailer, item_id)
+        fetch(get_movie_watch_providers, item_id)
+    else:
+        if not call(get_tv_info, item_id):
+            return failed
+        credits = call(get_tv_credits, item_id)
+        call(get_similar_tv, item_id)
+        fetch(get_tv_trailer, item_id)
+        fetch(get_tv_watch_providers, item_id)
+    for person in (credits or {}).get('cast', [])[:cast_limit]:
+        call(get_person_info, person['id'])
+    return failed
+
+def warm_rails(limiter):
+    """Homepage/genre rails and category pages"""
+    genres = get_genres_dict()
+    jobs = [(fetch_movies_by_category, ("popular",), {'genre_id': g}) for g in genres['movies']]
+    jobs += [(fetch_tv_by_category, ("popular",), {'genre_id': g}) for g in genres['tv']]
+    jobs += [(fetch_movies_by_category, (c,), {}) for c in ['popular', 'now_playing', 'upcoming', 'top_rated']]
+    jobs += [(fetch_tv_by_category, (c,), {}) for c in ['popular', 'airing_today', 'on_the_air', 'top_rated']]
+    failed = []
+    for func, args, kwargs in jobs:
+        limiter.wait()
+        try:
+            ok = func(*args, **kwargs)
+        except Exception as e:
+            app.logger.warning(f"Warming {func.__name__}{args} failed: {e}")
+            ok = False
+        if not ok:
+            failed.append(f"{func.__name__}{args}{kwargs}")
+    return failed
+
+def select_titles(top, kind, ids, viewed=None):
+    """
+    (kind, id) pairs from a movie:ID,tv:ID list, the titles most viewed on
+    this site over a period, or the most popular catalog titles
+    """
+    if ids:
+        titles = []
+        for entry in filter(None, (entry.strip() for entry in ids.split(','))):
+            k, _, i = entry.partition(':')
+            if k not in ('movie', 'tv') or not i.isdigit():
+                raise click.BadParameter(f"expected movie:ID or tv:ID, got {entry!r}", param_hint='--ids')
+            titles.append((k, int(i)))
+        return titles
+    titles = []
+    for k, catalog in (('movie', movie_catalog), ('tv', tv_catalog)):
+        if kind not in (k, 'all'):
+            continue
+        if viewed:
+            titles += [(k, item_id) for item_id, _ in view_counts.top(k, VIEW_PERIODS[viewed], top)]
+        else:
+            titles += [(k, catalog.row(i)['id']) for i in catalog.top_rows(top)]
+    return titles
+
+@app.cli.command('warm-cache')
+@click.option('--top', default=500, show_default=True, help='Most popular titles per catalog to warm.')
+@click.option('--kind', type=click.Choice(['movie', 'tv', 'all']), default='all', show_default=True)
+@click.option('--ids', default=None, help='Comma-separated movie:ID / tv:ID list instead of --top.')
+@click.option('--workers', default=8, show_default=True, help='Concurrent fetches.')
+@click.option('--rate', default=30.0, show_default=True, help='Max TMDB calls per second (0 = unlimited).')
+@click.option('--state', default=None,
+              help='Progress file; titles finished by an interrupted or failed run are skipped on rerun.')
+@click.option('--fresh/--resume', default=None,
+              help='Ignore the progress file left by an unfinished run. Default: resume, or fresh with --viewed.')
+@click.option('--skip-rails', is_flag=True, help="Don't warm the homepage/genre/category rails.")
+@click.option('--viewed', type=click.Choice(list(VIEW_PERIODS)), default=None,
+              help='Pick the titles most viewed here over this period instead of catalog popularity.')
+def warm_cache(top, kind, ids, workers, rate, state, fresh, skip_rails, viewed):
+    """Pre-fetch detail bundles for popular titles into the TMDB cache"""
+    titles = select_titles(top, kind, ids, viewed)
+    state = state or os.path.join(app.instance_path, 'warm_cache.state')
+    if fresh is None:
+        # The most viewed titles change between runs; resuming would skip them
+        fresh = bool(viewed)
+    if fresh and os.path.exists(state):
+        os.remove(state)
+    done = set()
+    if os.path.exists(state):
+        with open(state) as f:
+            done = {line.strip() for line in f if line.strip()}
+    pending = [(k, i) for k, i in titles if f"{k}:{i}" not in done]
+    click.echo(f"Warming {len(pending)} titles ({len(titles) - len(pending)} already done) "
+               f"with {workers} workers at <= {rate or 'unlimited'} calls/s")
+
+    limiter = RateLimiter(rate)
+    started = time.monotonic()
+    failures = {}
+    state_lock = threading.Lock()
+    os.makedirs(os.path.dirname(os.path.abspath(state)), exist_ok=True)
+
+    with open(state, 'a') as progress, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(warm_title, k, i, limiter): (k, i) for k, i in pending}
+        if not skip_rails:
+            futures[pool.submit(warm_rails, limiter)] = ('rails', None)
+        for completed, future in enumerate(as_completed(futures), 1):
+            k, i = futures[future]
+            try:
+                failed = future.result()
+            except Exception as e:
+                failed = [repr(e)]
+            if failed:
+                failures[f"{k}:{i}"] = failed
+            elif k != 'rails':
+                with state_lock:
+                    progress.write(f"{k}:{i}\n")
+                    progress.flush()
+            if completed % 50 == 0:
+                elapsed = time.monotonic() - started
+                click.echo(f"  {completed}/{len(futures)} done, {completed / elapsed:.1f} titles/s")
+
+    elapsed = time.monotonic() - started
+    click.echo(f"Warmed {len(futures) - len(failures)}/{len(futures)} jobs in {elapsed:.1f}s "
+               f"({len(futures) / elapsed if elapsed else 0:.1f}/s), {len(failures)} with failures")
+    for key, failed in sorted(failures.items()):
+        click.echo(f"  {key}: {', '.join(failed)}")
+    if not failures:
+        # Everything is warm: the next run (after a deploy, cache-clear or
+        # expiry) should start over rather than skip it all
+        os.remove(state)
+
+@app.cli.command('top-viewed')
+@click.option('--kind', type=click.Choice(['movie', 'tv', 'person']), default='movie', show_default=True)
+@click.option('--period', type=click.Choice(list(VIEW_PERIODS)), default='week', show_default=True)
+@click.option('--limit', default=20, show_default=True)
+def top_viewed(kind, period, limit):
+    """List the most viewed titles over a period"""
+    catalog = {'movie': movie_catalog, 'tv': tv_catalog}.get(kind)
+    for item_id, views in view_counts.top(kind, VIEW_PERIODS[period], limit):
+        row = catalog.index_of(item_id) if catalog else None
+        title = catalog.titles[row] if row is not None else ''
+        click.echo(f"{views:>8}  {kind}:{item_id}  {title}")
+
+# ------------- Snapshot building -------------
+
+def snapshot_title(kind, item_id, limiter, cast_limit):
+    """Store the detail bundle of a title and its top cast. Returns failed keys."""
+    limiter.wait(cost=6 if kind == 'movie' else 5)
+    bundle = DETAIL_FETCHERS[kind](item_id)
+    if not bundle:
+        return [f"{kind}:{item_id}"]
+    snapshot_store.put(kind, item_id, bundle)
+    failed = []
+    for person in bundle['credits'].get('cast', [])[:cast_limit]:
+        limiter.wait()
+        person_data = get_person_info(person['id'])
+        if person_data:
+            snapshot_store.put('person', person['id'], person_data)
+        else:
+            failed.append(f"person:{person['id']}")
+    return failed
+
+@app.cli.command('build-snapshots')
+@click.option('--top', default=1000, show_default=True, help='Most popular titles per catalog to snapshot.')
+@click.option('--kind', type=click.Choice(['movie', 'tv', 'all']), default='all', show_default=True)
+@click.option('--ids', default=None, help='Comma-separated movie:ID / tv:ID list instead of --top.')
+@click.option('--workers', default=8, show_default=True, help='Concurrent fetches.')
+@click.option('--rate', default=30.0, show_default=True, help='Max TMDB calls per second (0 = unlimited).')
+@click.option('--max-age', default=24.0, show_default=True, help='Skip snapshots fresher than this many hours.')
+@click.option('--cast', 'cast_limit', default=5, show_default=True, help='Also snapshot this many cast members per title.')
+def build_snapshots(top, kind, ids, workers, rate, max_age, cast_limit):
+    """Build or refresh the offline detail snapshot store"""
+    cutoff = time.time() - max_age * 3600
+    titles = select_titles(top, kind, ids)
+    pending = [(k, i) for k, i in titles if (snapshot_store.fetched_at(k, i) or 0) < cutoff]
+    click.echo(f"Snapshotting {len(pending)} titles ({len(titles) - len(pending)} still fresh)")
+
+    limiter = RateLimiter(rate)
+    started = time.monotonic()
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(snapshot_title, k, i, limiter, cast_limit): (k, i) for k, i in pending}
+        for completed, future in enumerate(as_completed(futures), 1):
+            try:
+                failures += future.result()
+            except Exception as e:
+                k, i = futures[future]
+                failures.append(f"{k}:{i} ({e!r})")
+            if completed % 50 == 0:
+                elapsed = time.monotonic() - started
+                click.echo(f"  {completed}/{len(futures)} done, {completed / elapsed:.1f} titles/s")
+
+    elapsed = time.monotonic() - started
+    counts = ', '.join(f"{n} {k}" for k, n in sorted(snapshot_store.counts().items()))
+    click.echo(f"Snapshotted {len(pending)} titles in {elapsed:.1f}s with {len(failures)} failures; store holds {counts or 'nothing'}")
+    for failure in failures:
+        click.echo(f"  {failure}")
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,507 @@
+"""
+Load test for capacity planning.
+
+Starts a fake TMDB API and the app under gunicorn with several workers,
+signs up a few users, then replays a weighted mix of page views, JSON
+calls, searches and watchlist changes at increasing concurrency. Each
+stage reports throughput, latency percentiles, error rate, RSS per worker
+and how many calls reached the (fake) TMDB, as JSON so runs can be diffed
+across commits:
+
+    pip install gunicorn
+    flask --app App build-catalog
+    python loadtest.py --workers 4 --stages 1,8,32 --duration 20 --output run.json
+
+Linux only (RSS is read from /proc).
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = {
+    'home': 8,
+    'movie_category': 8,
+    'tv_category': 6,
+    'genre': 8,
+    'movie_detail': 20,
+    'movie_section': 10,
+    'tv_detail': 10,
+    'tv_section': 4,
+    'person': 5,
+    'recommend': 8,
+    'search': 5,
+    'watchlist': 8,
+}
+MOVIE_CATEGORIES = ['popular', 'now_playing', 'upcoming', 'top_rated']
+TV_CATEGORIES = ['popular', 'airing_today', 'on_the_air', 'top_rated']
+MOVIE_GENRES = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 27, 10749, 878, 53]
+TV_GENRES = [10759, 16, 35, 80, 99, 18, 10751, 10765]
+MOVIE_SECTIONS = ['credits', 'trailer', 'related', 'similar', 'recommendations', 'providers']
+TV_SECTIONS = ['credits', 'trailer', 'similar', 'recommendations', 'providers']
+
+# ------------- Fake TMDB -------------
+
+def fake_title(kind, item_id):
+    rng = random.Random(f"{kind}{item_id}")
+    date = f"{rng.randint(1970, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    item = {
+        'id': item_id,
+        'overview': f"Overview of {kind} {item_id}.",
+        'poster_path': f"/p{item_id}.jpg",
+        'backdrop_path': f"/b{item_id}.jpg",
+        'vote_average': round(rng.uniform(4, 9), 1),
+        'popularity': round(rng.uniform(1, 500), 2),
+        'genre_ids': [28, 18],
+        'media_type': kind,
+    }
+    if kind == 'movie':
+        item.update(title=f"Movie {item_id}", release_date=date)
+    else:
+        item.update(name=f"Show {item_id}", first_air_date=date)
+    return item
+
+def fake_page(kind, seed):
+    rng = random.Random(seed)
+    return {'page': 1, 'results': [fake_title(kind, rng.randint(1, 100000)) for _ in range(20)]}
+
+def fake_credits(item_id):
+    rng = random.Random(item_id)
+    cast = [{'id': rng.randint(1, 5000), 'name': f"Actor {i}", 'character': f"Role {i}",
+             'profile_path': f"/a{i}.jpg"} for i in range(15)]
+    crew = [{'id': rng.randint(1, 5000), 'name': f"Crew {i}", 'job': job, 'profile_path': None}
+            for i, job in enumerate(['Director', 'Writer', 'Producer', 'Editor'])]
+    return {'id': item_id, 'cast': cast, 'crew': crew}
+
+def fake_season(number):
+    return {'season_number': number, 'name': f"Season {number}", 'overview': '', 'air_date': '2015-01-01',
+            'poster_path': None,
+            'episodes': [{'episode_number': e, 'name': f"Episode {e}", 'overview': '', 'air_date': '2015-01-01',
+                          'runtime': 45, 'still_path': None, 'vote_average': 7.5} for e in range(1, 11)]}
+
+def fake_response(path, query):
+    """JSON body for a TMDB API path (without the /3 prefix), or None for 404"""
+    parts = path.strip('/').split('/')
+    head, rest = parts[0], parts[1:]
+    if head == 'discover' and rest:
+        return fake_page('movie' if rest[0] == 'movie' else 'tv', path + str(query.get('with_genres')))
+    if head in ('movie', 'tv') and rest and not rest[0].isdigit():
+        return fake_page(head, path)
+    if head in ('movie', 'tv') and rest:
+        item_id = int(rest[0])
+        sub = rest[1:]
+        if not sub:
+            item = fake_title(head, item_id)
+            item.update(genres=[{'id': 28, 'name': 'Action'}, {'id': 18, 'name': 'Drama'}], tagline='')
+            if head == 'movie':
+                item.update(runtime=120, belongs_to_collection={'id': item_id % 500} if item_id % 3 == 0 else None)
+            else:
+                seasons = [fake_season(n) for n in range(1, 6)]
+                item.update(number_of_seasons=5, number_of_episodes=50, episode_run_time=[45],
+                            seasons=[{k: s[k] for k in ('season_number', 'name', 'air_date', 'poster_path')}
+                                     | {'episode_count': 10} for s in seasons])
+                for entry in query.get('append_to_response', [''])[0].split(','):
+                    if entry.startswith('season/'):
+                        item[entry] = fake_season(int(entry.split('/')[1]))
+            return item
+        if sub == ['credits']:
+            return fake_credits(item_id)
+        if sub == ['videos']:
+            return {'results': [{'site': 'YouTube', 'type': 'Trailer', 'key': f"yt{item_id}"}]}
+        if sub == ['similar']:
+            return fake_page(head, path)
+        if sub == ['watch', 'providers']:
+            providers = {'link': 'https://www.themoviedb.org/', 'flatrate': [
+                {'provider_id': 8, 'provider_name': 'Netflix', 'logo_path': '/n.jpg'}]}
+            return {'results': {region: providers for region in ('IN', 'US', 'GB', 'AU', 'CA')}}
+        if head == 'tv' and len(sub) == 2 and sub[0] == 'season':
+            return fake_season(int(sub[1]))
+        return None
+    if head == 'collection' and rest:
+        return {'id': int(rest[0]), 'name': 'Collection', 'parts': fake_page('movie', path)['results'][:4]}
+    if head == 'person' and rest:
+        person_id = int(rest[0])
+        rng = random.Random(person_id)
+        credits = [fake_title(rng.choice(['movie', 'tv']), rng.randint(1, 100000)) | {'character': 'Someone'}
+                   for _ in range(rng.randint(10, 400))]
+        return {'id': person_id, 'name': f"Person {person_id}", 'biography': '', 'birthday': '1970-01-01',
+                'place_of_birth': 'Somewhere', 'gender': 2, 'known_for_department': 'Acting',
+                'also_known_as': [], 'profile_path': None, 'images': {'profiles': []},
+                'combined_credits': {'cast': credits, 'crew': []}}
+    return None
+
+def fake_tmdb_handler(latency):
+    calls = Counter()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/__stats':
+                with lock:
+                    return self.send_json(200, dict(calls))
+            with lock:
+                calls[re.sub(r'/\d+', '/:id', url.path)] += 1
+            if latency:
+                time.sleep(latency)
+            body = fake_response(url.path[len('/3'):], parse_qs(url.query)) if url.path.startswith('/3/') else None
+            if body is None:
+                return self.send_json(404, {'status_code': 34, 'status_message': 'Not found'})
+            self.send_json(200, body)
+
+    return Handler
+
+def serve_fake_tmdb(port, latency):
+    server = ThreadingHTTPServer(('127.0.0.1', port), fake_tmdb_handler(latency))
+    server.daemon_threads = True
+    server.serve_forever()
+
+# ------------- App server -------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}")
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # ppid is the 4th field, after the parenthesised command name
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == master_pid:
+                    pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(pids)
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+# ------------- Workload -------------
+
+def load_catalog_sample(kind):
+    path = os.path.join(ROOT, 'model', f"catalog_{'movies' if kind == 'movie' else 'tv'}.npz")
+    if not os.path.exists(path):
+        sys.exit(f"{path} not found; run `flask --app App build-catalog` first")
+    with np.load(path, allow_pickle=False) as data:
+        return data['ids'].tolist(), data['titles'].tolist()
+
+class Workload:
+    def __init__(self, base_url, mix, users, password, seed):
+        self.base_url = base_url
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.users = users
+        self.password = password
+        self.rng = random.Random(seed)
+        self.movie_ids, self.movie_titles = load_catalog_sample('movie')
+        self.tv_ids, self.tv_titles = load_catalog_sample('tv')
+
+    def login(self, session, email):
+        session.post(f"{self.base_url}/login", data={'email': email, 'password': self.password},
+                     allow_redirects=False, timeout=30)
+
+    def request(self, session, rng, kind):
+        """Issue one request of the given kind; returns the final status code"""
+        base = self.base_url
+        if kind == 'home':
+            return session.get(f"{base}/").status_code
+        if kind == 'movie_category':
+            return session.get(f"{base}/movies/{rng.choice(MOVIE_CATEGORIES)}").status_code
+        if kind == 'tv_category':
+            return session.get(f"{base}/tv/{rng.choice(TV_CATEGORIES)}").status_code
+        if kind == 'genre':
+            if rng.random() < 0.6:
+                return session.get(f"{base}/genre/movie/{rng.choice(MOVIE_GENRES)}").status_code
+            return session.get(f"{base}/genre/tv/{rng.choice(TV_GENRES)}").status_code
+        if kind == 'movie_detail':
+            return session.get(f"{base}/movie/{rng.choice(self.movie_ids)}").status_code
+        if kind == 'movie_section':
+            return session.get(f"{base}/api/movie/{rng.choice(self.movie_ids)}/{rng.choice(MOVIE_SECTIONS)}").status_code
+        if kind == 'tv_detail':
+            return session.get(f"{base}/tv/{rng.choice(self.tv_ids)}").status_code
+        if kind == 'tv_section':
+            return session.get(f"{base}/api/tv/{rng.choice(self.tv_ids)}/{rng.choice(TV_SECTIONS)}").status_code
+        if kind == 'person':
+            return session.get(f"{base}/person/{rng.randint(1, 5000)}").status_code
+        if kind == 'recommend':
+            if rng.random() < 0.5:
+                data = {'movie': rng.choice(self.movie_titles), 'content_type': 'movie'}
+            else:
+                data = {'movie': rng.choice(self.tv_titles), 'content_type': 'tv'}
+            return session.post(f"{base}/recommend", data=data).status_code
+        if kind == 'search':
+            title = rng.choice(self.movie_titles + self.tv_titles)
+            return session.get(f"{base}/api/search", params={'q': title[:max(3, len(title) // 2)]}).status_code
+        if kind == 'watchlist':
+            item_type = rng.choice(['movie', 'tv'])
+            item_id = rng.choice(self.movie_ids if item_type == 'movie' else self.tv_ids)
+            response = session.post(f"{base}/add_to_watchlist", json={
+                'item_id': item_id, 'item_type': item_type, 'title': f"Title {item_id}", 'poster_path': None})
+            if response.status_code != 200:
+                return response.status_code
+            if response.json().get('id'):
+                return session.post(f"{base}/remove_from_watchlist",
+                                    json={'watchlist_item_id': response.json()['id']}).status_code
+            return session.get(f"{base}/watchlist").status_code
+        raise ValueError(kind)
+
+    def run_stage(self, concurrency, duration):
+        samples = []
+        lock = threading.Lock()
+        deadline = time.time() + duration
+
+        def worker(index):
+            rng = random.Random(self.rng.random())
+            session = requests.Session()
+            self.login(session, self.users[index % len(self.users)])
+            local = []
+            while time.time() < deadline:
+                kind = rng.choices(self.kinds, self.weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = self.request(session, rng, kind)
+                except requests.RequestException:
+                    status = None
+                local.append((kind, status, (time.perf_counter() - started) * 1000))
+            with lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.time() - started
+
+# ------------- Reporting -------------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[index], 1)
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': round(values[-1], 1) if values else None,
+        'mean': round(sum(values) / len(values), 1) if values else None,
+    }
+
+def is_error(status):
+    return status is None or status >= 400
+
+def stage_report(concurrency, samples, elapsed, upstream, rss):
+    by_kind = defaultdict(list)
+    for kind, status, latency in samples:
+        by_kind[kind].append((status, latency))
+    errors = sum(1 for _, status, _ in samples if is_error(status))
+    upstream_total = sum(upstream.values())
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'status_counts': dict(Counter(str(status) for _, status, _ in samples)),
+        'latency_ms': latency_summary([latency for _, _, latency in samples]),
+        'by_kind': {
+            kind: {
+                'requests': len(results),
+                'errors': sum(1 for status, _ in results if is_error(status)),
+                **latency_summary([latency for _, latency in results]),
+            } for kind, results in sorted(by_kind.items())
+        },
+        'upstream_calls': {
+            'total': upstream_total,
+            'per_request': round(upstream_total / len(samples), 3) if samples else 0,
+            'by_endpoint': dict(sorted(upstream.items())),
+        },
+        'rss_mb': {'workers': rss, 'total': round(sum(r for r in rss if r), 1)},
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or '').split(',')):
+        kind, _, weight = part.partition('=')
+        if kind not in DEFAULT_MIX:
+            sys.exit(f"Unknown request kind {kind!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+# ------------- Main -------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per worker (gthread when > 1)')
+    parser.add_argument('--stages', default='1,4,16,32', help='comma separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per stage')
+    parser.add_argument('--users', type=int, default=8, help='accounts used for logged-in traffic')
+    parser.add_argument('--mix', help='override request weights, e.g. movie_detail=40,home=2')
+    parser.add_argument('--upstream-latency', type=float, default=0.08, help='seconds the fake TMDB waits per call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--preload', action='store_true', help='load the app once in the gunicorn master')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--keep-data', action='store_true', help="don't delete the run's databases and logs")
+    args = parser.parse_args()
+
+    stages = [int(c) for c in args.stages.split(',') if c.strip()]
+    mix = parse_mix(args.mix)
+    data_dir = tempfile.mkdtemp(prefix='loadtest-')
+    fake_port, app_port = free_port(), free_port()
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    fake = subprocess.Popen([sys.executable, __file__, '--fake-tmdb', str(fake_port), str(args.upstream_latency)])
+    env = dict(os.environ,
+               TMDB_API_URL=f"http://127.0.0.1:{fake_port}/3",
+               TMDB_IMAGE_BASE=f"http://127.0.0.1:{fake_port}/t/p",
+               TMDB_API_KEY='loadtest',
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'loadtest'),
+               SESSION_COOKIE_SECURE='0',
+               DATABASE_URL=f"sqlite:///{os.path.join(data_dir, 'users.db')}",
+               TMDB_CACHE_URL=os.environ.get('TMDB_CACHE_URL', os.path.join(data_dir, 'tmdb_cache.db')),
+               SNAPSHOT_PATH=os.path.join(data_dir, 'snapshots.db'),
+               IMAGE_CACHE_DIR=os.path.join(data_dir, 'images'),
+               VIEW_COUNTS_PATH=os.path.join(data_dir, 'views.db'),
+               PROFILE_DIR=os.path.join(data_dir, 'profiles'))
+    server = None
+    log = open(os.path.join(data_dir, 'server.log'), 'w')
+    try:
+        wait_until_up(f"http://127.0.0.1:{fake_port}/__stats", fake, 30)
+        # Tables first, so workers don't race to create them
+        subprocess.run([sys.executable, '-c', 'import App\nwith App.app.app_context(): App.db.create_all()'],
+                       cwd=ROOT, env=env, stdout=log, stderr=log, check=True)
+        command = [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{app_port}",
+                   '--workers', str(args.workers), '--timeout', '120', 'App:app']
+        if args.threads > 1:
+            command += ['--worker-class', 'gthread', '--threads', str(args.threads)]
+        if args.preload:
+            command.append('--preload')
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=log)
+        wait_until_up(f"{base_url}/api/session", server, 120)
+
+        password = 'loadtest-password'
+        users = [f"loadtest{i}@example.com" for i in range(max(args.users, 1))]
+        for email in users:
+            requests.post(f"{base_url}/signup", allow_redirects=False, timeout=30, data={
+                'name': email.split('@')[0], 'email': email,
+                'password': password, 'confirm_password': password})
+
+        workload = Workload(base_url, mix, users, password, args.seed)
+        reports = []
+        for concurrency in stages:
+            before = requests.get(f"http://127.0.0.1:{fake_port}/__stats").json()
+            samples, elapsed = workload.run_stage(concurrency, args.duration)
+            after = requests.get(f"http://127.0.0.1:{fake_port}/__stats").json()
+            upstream = {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+            rss = [rss_mb(pid) for pid in worker_pids(server.pid)]
+            report = stage_report(concurrency, samples, elapsed, upstream, rss)
+            reports.append(report)
+            print(f"concurrency={concurrency} rps={report['throughput_rps']} "
+                  f"p50={report['latency_ms']['p50']}ms p95={report['latency_ms']['p95']}ms "
+                  f"errors={report['error_rate']:.2%} upstream/req={report['upstream_calls']['per_request']}",
+                  file=sys.stderr)
+
+        result = {
+            'tool': 'loadtest',
+            'format': 1,
+            'commit': git_commit(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {
+                'workers': args.workers, 'threads': args.threads, 'preload': args.preload,
+                'duration_s': args.duration, 'users': len(users), 'mix': mix,
+                'upstream_latency_s': args.upstream_latency, 'seed': args.seed,
+            },
+            'stages': reports,
+        }
+        output = json.dumps(result, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(output + '\n')
+        else:
+            print(output)
+    finally:
+        for process in (server, fake):
+            if process and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        log.close()
+        if args.keep_data:
+            print(f"Run data kept in {data_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--fake-tmdb':
+        serve_fake_tmdb(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,149 @@
+"""
+App.py loads its models and opens its stores at import time, so the test
+session points every path at a temporary directory (with a ten-title
+movie and TV catalog) before importing it. TMDB is replaced per test by
+the `tmdb` fixture; nothing here touches the network.
+"""
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='movie-app-tests-')
+
+
+def write_model_files(directory):
+    os.makedirs(os.path.join(directory, 'model'))
+    for kind, first_id, stem, title in (('movies', 100, 'catalog_movies', 'Movie'),
+                                        ('tv', 500, 'catalog_tv', 'Show')):
+        ids = np.arange(first_id, first_id + 10)
+        np.savez_compressed(
+            os.path.join(directory, 'model', f'{stem}.npz'),
+            ids=ids,
+            titles=np.array([f'{title} {i}' for i in range(10)]),
+            posters=np.array([f'/{kind}{i}.jpg' for i in range(10)]),
+            dates=np.array([f'20{i:02d}-01-01' for i in range(10)]),
+            popularity=np.arange(10, dtype=np.float64),
+        )
+    rng = np.random.default_rng(0)
+    for name in ('tmdb_similarity.pkl', 'tmdb_tv_similarity.pkl'):
+        similarity = rng.random((10, 10))
+        joblib.dump((similarity + similarity.T) / 2, os.path.join(directory, 'model', name))
+
+
+write_model_files(WORKDIR)
+os.environ.update({
+    'SECRET_KEY': 'test',
+    'TMDB_API_KEY': 'test',
+    'TMDB_API_URL': 'https://tmdb.test/3',
+    'TMDB_IMAGE_BASE': 'https://images.tmdb.test/t/p',
+    'TMDB_CACHE_URL': os.path.join(WORKDIR, 'tmdb_cache.db'),
+    'SNAPSHOT_PATH': os.path.join(WORKDIR, 'snapshots.db'),
+    'VIEW_COUNTS_PATH': os.path.join(WORKDIR, 'views.db'),
+    'VIEW_FLUSH_INTERVAL': '3600',
+    'IMAGE_CACHE_DIR': os.path.join(WORKDIR, 'images'),
+    'PROFILE_DIR': os.path.join(WORKDIR, 'profiles'),
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'users.db')}",
+    'SESSION_COOKIE_SECURE': '0',
+    'BACKGROUND_TASKS_SYNC': '1',
+})
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+import App  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=b'', headers=None):
+        self.status_code = status_code
+        self._payload = payload if payload is not None else {}
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise App.requests.HTTPError(f"{self.status_code} error")
+
+
+class FakeTMDB:
+    """
+    Stand-in for requests.get. Routes are matched by URL substring, most
+    specific (longest) first; `down` makes every call raise like an outage.
+    """
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+        self.down = False
+
+    def route(self, fragment, payload=None, status_code=200, **kwargs):
+        self.routes[fragment] = FakeResponse(status_code, payload, **kwargs)
+
+    def __call__(self, url, *args, **kwargs):
+        self.calls.append(url)
+        if self.down:
+            raise App.requests.ConnectionError('TMDB is down')
+        for fragment in sorted(self.routes, key=len, reverse=True):
+            if fragment in url:
+                return self.routes[fragment]
+        return FakeResponse(404)
+
+
+@pytest.fixture
+def app_module():
+    return App
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    App.tmdb_cache.clear()
+    App.tmdb_breaker.success()
+    App._tmdb_backoff['until'] = 0.0
+    yield
+
+
+@pytest.fixture
+def tmdb(monkeypatch):
+    fake = FakeTMDB()
+    monkeypatch.setattr(App.requests, 'get', fake)
+    return fake
+
+
+@pytest.fixture
+def db():
+    with App.app.app_context():
+        App.db.drop_all()
+        App.db.create_all()
+        yield App.db
+        App.db.session.remove()
+
+
+@pytest.fixture
+def client():
+    return App.app.test_client()
+
+
+@pytest.fixture
+def user(db, client):
+    """A signed-in user; returns its id"""
+    user = App.User('user-1', 'Test User', 'user@example.com', None)
+    db.session.add(user)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = user.id
+    return user.id
+
+
+@pytest.fixture
+def broken_cache(monkeypatch):
+    """Every shared-cache call fails, as with an unreachable Redis or a locked SQLite file"""
+    def fail(*args, **kwargs):
+        raise OSError('cache backend unavailable')
+    for name in ('get', 'set', 'delete'):
+        monkeypatch.setattr(App.tmdb_cache, name, fail)
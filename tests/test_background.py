@@ -0,0 +1,115 @@
+import threading
+import time
+
+from App import TaskExecutor
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_sync_mode_runs_jobs_inline():
+    executor = TaskExecutor(sync=True)
+    done = []
+    assert executor.submit(done.append, 1)
+    assert done == [1]
+    stats = executor.stats()
+    assert stats['completed'] == 1
+    assert stats['queue_length'] == 0
+    assert stats['tasks']['append']['count'] == 1
+
+
+def test_failures_are_counted_not_raised():
+    executor = TaskExecutor(sync=True)
+
+    def broken():
+        raise RuntimeError('boom')
+
+    assert executor.submit(broken)
+    assert executor.stats()['failed'] == 1
+
+
+def test_jobs_are_dropped_when_the_queue_is_full():
+    executor = TaskExecutor(workers=1, max_queue=2)
+    release = threading.Event()
+    executor.submit(release.wait, 5)
+    wait_for(lambda: executor.stats()['running'] == 1)
+
+    assert executor.submit(release.wait, 5)
+    assert executor.submit(release.wait, 5)
+    assert not executor.submit(release.wait, 5)
+    stats = executor.stats()
+    assert stats['queue_length'] == 2
+    assert stats['dropped'] == 1
+
+    release.set()
+    executor.shutdown(timeout=2)
+    assert executor.stats()['completed'] == 3
+
+
+def test_jobs_with_the_same_key_are_coalesced_until_done():
+    executor = TaskExecutor(workers=1, max_queue=10)
+    release = threading.Event()
+    assert executor.submit(release.wait, 5, key='refresh:a')
+    assert not executor.submit(release.wait, 5, key='refresh:a')
+    assert executor.submit(release.wait, 5, key='refresh:b')
+    assert executor.stats()['coalesced'] == 1
+
+    release.set()
+    wait_for(lambda: executor.stats()['completed'] == 2)
+    # Finished keys can be submitted again
+    assert executor.submit(release.wait, 5, key='refresh:a')
+    executor.shutdown(timeout=2)
+
+
+def test_shutdown_drains_queued_jobs_and_refuses_new_ones():
+    executor = TaskExecutor(workers=2, max_queue=100)
+    done = []
+    for n in range(20):
+        executor.submit(lambda n=n: (time.sleep(0.005), done.append(n)))
+    executor.shutdown(timeout=5)
+
+    assert sorted(done) == list(range(20))
+    assert not executor.submit(done.append, 'late')
+    stats = executor.stats()
+    assert stats['completed'] == 20
+    assert stats['dropped'] == 1
+
+
+def test_stats_report_wait_and_run_latency():
+    executor = TaskExecutor(workers=1, max_queue=10)
+    executor.submit(time.sleep, 0.05)
+    executor.shutdown(timeout=2)
+    sleep_stats = executor.stats()['tasks']['sleep']
+    assert sleep_stats['count'] == 1
+    assert sleep_stats['avg_run_ms'] >= 40
+    assert sleep_stats['max_run_ms'] >= sleep_stats['avg_run_ms']
+
+
+def test_every_submits_periodically():
+    executor = TaskExecutor(sync=True)
+    ticks = []
+    executor.every(0.02, ticks.append, 'tick', key='tick')
+    wait_for(lambda: len(ticks) >= 3)
+    executor.shutdown(timeout=2)
+
+
+def test_background_refresh_keeps_the_good_page_during_an_outage(app_module, tmdb, client):
+    movie = {'id': 101, 'title': 'Movie 1', 'release_date': '2001-01-01', 'genres': [],
+             'vote_average': 7, 'runtime': 90, 'overview': 'Fresh overview'}
+    tmdb.route('/movie/101', movie)
+    assert client.get('/movie/101').status_code == 200
+    key = f"page:{app_module.PAGE_DATA_VERSION}:/movie/101"
+    rendered_at, html = app_module.tmdb_cache.get(key)
+    assert 'Fresh overview' in html
+
+    # The copy is stale and TMDB is down: the refresh must not store the stub
+    app_module.tmdb_cache.set(key, [rendered_at - app_module.PAGE_CACHE_TTL - 1, html], 600)
+    app_module.get_movie_details.invalidate(101)
+    tmdb.down = True
+    response = client.get('/movie/101')
+    assert b'Fresh overview' in response.data
+    assert app_module.tmdb_cache.get(key)[1] == html
@@ -0,0 +1,82 @@
+import os
+import time
+
+from App import ImageCache
+from conftest import FakeResponse
+
+
+def set_mtime(path, age):
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def test_put_then_get(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    path = cache.put('w185', 'a.jpg', b'x' * 10)
+    assert path == os.path.join(str(tmp_path), 'w185', 'a.jpg')
+    assert cache.get('w185', 'a.jpg') == path
+    assert cache.get('w185', 'missing.jpg') is None
+    # The first put measures the directory (inline in sync mode)
+    assert cache._size == 10
+    assert cache._scanned_at is not None
+
+
+def test_eviction_removes_least_recently_served_down_to_90_percent(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=100)
+    for n, age in enumerate((500, 400, 300, 200)):
+        path = cache.put('w92', f'{n}.jpg', b'x' * 25)
+        set_mtime(path, age)
+
+    # Over budget: 125 bytes, evict oldest until at most 90
+    cache.put('w185', 'new.jpg', b'x' * 25)
+    remaining = sorted(os.listdir(tmp_path / 'w92'))
+    assert remaining == ['2.jpg', '3.jpg']
+    assert os.path.exists(tmp_path / 'w185' / 'new.jpg')
+    assert cache._size == 75
+
+
+def test_get_only_touches_files_not_served_recently(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    path = cache.put('w92', 'a.jpg', b'x')
+
+    set_mtime(path, 60)
+    before = os.stat(path).st_mtime
+    cache.get('w92', 'a.jpg')
+    assert os.stat(path).st_mtime == before
+
+    set_mtime(path, ImageCache.TOUCH_INTERVAL + 60)
+    cache.get('w92', 'a.jpg')
+    assert time.time() - os.stat(path).st_mtime < 60
+
+
+def test_rescan_picks_up_other_workers_files(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1000)
+    cache.put('w92', 'a.jpg', b'x' * 10)
+    # Another worker's write since the last walk
+    os.makedirs(tmp_path / 'w185')
+    (tmp_path / 'w185' / 'b.jpg').write_bytes(b'x' * 30)
+
+    cache.put('w92', 'c.jpg', b'x' * 10)  # not due: estimate only
+    assert cache._size == 20
+    cache._scanned_at -= ImageCache.RESCAN_INTERVAL + 1
+    cache.put('w92', 'd.jpg', b'x' * 10)
+    assert cache._size == 60
+
+
+def test_proxy_fetches_once_then_serves_from_disk(app_module, client, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse(content=b'poster-bytes')
+    monkeypatch.setattr(app_module.image_session, 'get', fake_get)
+    monkeypatch.setattr(app_module, 'image_cache', ImageCache(app_module.IMAGE_CACHE_DIR, 1000))
+
+    for _ in range(2):
+        response = client.get('/img/w185/poster.jpg')
+        assert response.status_code == 200
+        assert response.data == b'poster-bytes'
+        response.close()
+    assert calls == [f"{app_module.TMDB_IMAGE_BASE}/w185/poster.jpg"]
+    assert client.get('/img/w999/poster.jpg').status_code == 404
+    assert client.get('/img/w185/..%2Fsecret.jpg').status_code == 404
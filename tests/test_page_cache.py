@@ -0,0 +1,66 @@
+MOVIE = {'id': 101, 'title': 'Movie 1', 'release_date': '2001-01-01', 'genres': [],
+         'vote_average': 7, 'runtime': 90, 'overview': 'An overview'}
+POPULAR = {'results': [{'id': 101, 'title': 'Movie 1', 'poster_path': '/m1.jpg',
+                        'release_date': '2001-01-01', 'vote_average': 7}]}
+
+
+def page_key(app_module, path):
+    return f"page:{app_module.PAGE_DATA_VERSION}:{path}"
+
+
+def test_public_pages_are_stored_and_served_with_etags(app_module, tmdb, client):
+    tmdb.route('/movie/popular', POPULAR)
+    response = client.get('/movies/popular?utm_source=x')
+    assert response.status_code == 200
+    assert response.cache_control.public
+    assert isinstance(app_module.tmdb_cache.get(page_key(app_module, '/movies/popular')), list)
+
+    calls = len(tmdb.calls)
+    again = client.get('/movies/popular', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert len(tmdb.calls) == calls
+
+
+def test_a_cache_outage_renders_pages_uncached(app_module, tmdb, client, broken_cache):
+    tmdb.route('/movie/101', MOVIE)
+    tmdb.route('/movie/popular', POPULAR)
+    for path in ('/movie/101', '/movies/popular', '/'):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        response.get_data()
+    assert b'An overview' in client.get('/movie/101').data
+
+
+def test_pages_with_failed_lists_are_not_cached(app_module, tmdb, client):
+    tmdb.down = True
+    for path in ('/movies/popular', '/tv/popular', '/genre/movie/28', '/'):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        response.get_data()
+        assert not response.cache_control.public, path
+        assert app_module.tmdb_cache.get(page_key(app_module, path)) is app_module.MISSING, path
+
+    # TMDB is back: the live lists are rendered and cached
+    tmdb.down = False
+    app_module.tmdb_breaker.success()  # cool-down over
+    tmdb.route('/movie/popular', POPULAR)
+    response = client.get('/movies/popular')
+    assert b'Movie 1' in response.data and response.cache_control.public
+    assert isinstance(app_module.tmdb_cache.get(page_key(app_module, '/movies/popular')), list)
+
+
+def test_homepage_with_an_empty_rail_is_not_cached(app_module, tmdb, client, monkeypatch):
+    rail = {'results': [{'id': 101, 'title': 'Movie 1', 'name': 'Show 1', 'poster_path': '/p.jpg',
+                         'vote_average': 7}]}
+    tmdb.route('/discover/movie', rail)
+    tmdb.route('/discover/tv', rail)
+    tmdb.route('/discover/movie?with_genres=36', {'results': []})
+    for streaming in (True, False):
+        monkeypatch.setattr(app_module, 'INDEX_STREAMING', streaming)
+        client.get('/').get_data()
+        assert app_module.tmdb_cache.get(page_key(app_module, '/')) is app_module.MISSING
+
+    app_module.tmdb_cache.clear()
+    tmdb.route('/discover/movie?with_genres=36', rail)
+    client.get('/').get_data()
+    assert isinstance(app_module.tmdb_cache.get(page_key(app_module, '/')), list)
@@ -0,0 +1,26 @@
+def person(name, *titles):
+    return {'id': 9, 'name': name, 'biography': '', 'birthday': None, 'profile_path': None,
+            'combined_credits': {'cast': [{'id': 100 + n, 'media_type': 'movie', 'title': title,
+                                           'release_date': f'20{n:02d}-01-01', 'popularity': n}
+                                          for n, title in enumerate(titles)]},
+            'images': {'profiles': []}}
+
+
+def test_credits_from_a_snapshot_are_not_kept_after_tmdb_recovers(app_module, tmdb, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'snapshot_store', app_module.SnapshotStore(str(tmp_path / 'snapshots.db')))
+    app_module.snapshot_store.put('person', 9, person('Old Name', 'Old Film'))
+
+    tmdb.down = True
+    response = client.get('/person/9')
+    assert response.status_code == 200
+    assert b'Old Film' in response.data
+    assert app_module.tmdb_cache.get(app_module.get_person_credits.cache_key(9)) is app_module.MISSING
+
+    tmdb.down = False
+    app_module.tmdb_breaker.success()
+    tmdb.route('/person/9', person('New Name', 'New Film'))
+    response = client.get('/person/9')
+    assert b'New Name' in response.data and b'New Film' in response.data
+    assert b'Old Film' not in response.data
+    credits = client.get('/api/person/9/credits').get_json()
+    assert [c['title'] for c in credits['results']] == ['New Film']
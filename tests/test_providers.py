@@ -0,0 +1,20 @@
+import pytest
+
+PROVIDERS = {'results': {'GB': {'flatrate': [{'provider_id': 8, 'provider_name': 'Stream', 'logo_path': '/s.png'}]}}}
+
+
+@pytest.mark.parametrize('path', ['/api/movie/101/providers', '/api/tv/500/providers',
+                                  '/movie/101/refresh_providers'])
+def test_unknown_regions_are_rejected_before_calling_tmdb(app_module, tmdb, client, path):
+    for region in ('zz', 'GBR', '../x'):
+        assert client.get(f'{path}?region={region}').status_code == 400
+    assert tmdb.calls == []
+    assert app_module.tmdb_cache.stats()['entries'] == 0
+
+
+def test_known_regions_are_case_insensitive(app_module, tmdb, client):
+    tmdb.route('/movie/101/watch/providers', PROVIDERS)
+    tmdb.route('/tv/500/watch/providers', PROVIDERS)
+    assert client.get('/api/movie/101/providers?region=gb').get_json()['region'] == 'GB'
+    assert client.get('/api/tv/500/providers?region=gb').get_json()['region'] == 'GB'
+    assert client.get('/movie/101/refresh_providers?region=gb').get_json()['has_providers']
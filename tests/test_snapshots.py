@@ -0,0 +1,134 @@
+import pytest
+from flask import g
+
+from App import CircuitBreaker, SnapshotStore
+
+LIVE = {'details': {'id': 101, 'title': 'Live'}, 'credits': {'cast': ['live'], 'crew': []}}
+SNAPSHOT = {'details': {'id': 101, 'title': 'Snapshot'}, 'credits': {'cast': ['snap'], 'crew': []}}
+
+
+@pytest.fixture
+def store(app_module, tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path / 'snapshots.db'))
+    monkeypatch.setattr(app_module, 'snapshot_store', store)
+    return store
+
+
+@pytest.fixture
+def fetcher(app_module, monkeypatch):
+    """The movie bundle fetcher; set `.result` to a bundle, None or an exception"""
+    def fetch(item_id):
+        fetch.calls.append(item_id)
+        if isinstance(fetch.result, Exception):
+            raise fetch.result
+        return fetch.result
+    fetch.calls = []
+    fetch.result = LIVE
+    monkeypatch.setitem(app_module.DETAIL_FETCHERS, 'movie', fetch)
+    return fetch
+
+
+def load(app_module, mode, monkeypatch, item_id=101):
+    monkeypatch.setattr(app_module, 'SNAPSHOT_MODE', mode)
+    with app_module.app.test_request_context():
+        return app_module.load_detail_bundle('movie', item_id), g.get('degraded', False)
+
+
+def test_store_round_trip(store):
+    assert store.get('movie', 101) is None
+    store.put('movie', 101, SNAPSHOT)
+    store.put('tv', 101, {'show': {}})
+    assert store.get('movie', 101) == SNAPSHOT
+    assert store.fetched_at('movie', 101) is not None
+    assert store.counts() == {'movie': 1, 'tv': 1}
+
+
+def test_fallback_mode_prefers_tmdb(app_module, store, fetcher, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    assert load(app_module, 'fallback', monkeypatch) == (LIVE, False)
+
+
+def test_fallback_mode_uses_the_snapshot_when_tmdb_fails(app_module, store, fetcher, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    fetcher.result = app_module.requests.ConnectionError('down')
+    assert load(app_module, 'fallback', monkeypatch) == (SNAPSHOT, True)
+    fetcher.result = None
+    assert load(app_module, 'fallback', monkeypatch) == (SNAPSHOT, True)
+
+
+def test_catalog_stub_when_there_is_no_snapshot(app_module, store, fetcher, monkeypatch):
+    fetcher.result = None
+    bundle, degraded = load(app_module, 'fallback', monkeypatch)
+    assert degraded
+    assert bundle['details']['title'] == 'Movie 1'
+    assert bundle['credits'] == {'cast': [], 'crew': []}
+    # Not in the catalog either
+    assert load(app_module, 'fallback', monkeypatch, item_id=999) == (None, True)
+
+
+def test_prefer_mode_only_calls_tmdb_for_missing_snapshots(app_module, store, fetcher, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    assert load(app_module, 'prefer', monkeypatch) == (SNAPSHOT, False)
+    assert fetcher.calls == []
+    assert load(app_module, 'prefer', monkeypatch, item_id=102) == (LIVE, False)
+    assert fetcher.calls == [102]
+
+
+def test_only_mode_never_calls_tmdb(app_module, store, fetcher, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    assert load(app_module, 'only', monkeypatch) == (SNAPSHOT, False)
+    bundle, degraded = load(app_module, 'only', monkeypatch, item_id=102)
+    assert degraded and bundle['details']['title'] == 'Movie 2'
+    assert fetcher.calls == []
+
+
+def test_sections_fall_back_like_bundles(app_module, store, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    monkeypatch.setattr(app_module, 'SNAPSHOT_MODE', 'fallback')
+
+    def failing(item_id):
+        raise app_module.requests.ConnectionError('down')
+
+    with app_module.app.test_request_context():
+        assert app_module.load_detail_section('movie', 101, 'credits', lambda item_id: {'cast': ['live']}) \
+            == {'cast': ['live']}
+        assert not g.get('degraded')
+        assert app_module.load_detail_section('movie', 101, 'credits', failing) == SNAPSHOT['credits']
+        assert g.degraded
+    with app_module.app.test_request_context():
+        assert app_module.load_detail_section('movie', 102, 'similar', failing) == []
+
+
+def test_breaker_opens_after_consecutive_failures_and_resets_on_success(monkeypatch):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert not breaker.allow()
+
+    # One more failure after the cool-down reopens it at once
+    breaker._open_until = 0.0
+    assert breaker.allow()
+    breaker.failure()
+    assert not breaker.allow()
+
+
+def test_open_breaker_skips_tmdb_and_serves_the_snapshot(app_module, store, tmdb, monkeypatch):
+    store.put('movie', 101, SNAPSHOT)
+    monkeypatch.setattr(app_module, 'SNAPSHOT_MODE', 'fallback')
+    monkeypatch.setattr(app_module, 'tmdb_breaker', CircuitBreaker(threshold=2, cooldown=30))
+    tmdb.down = True
+    for _ in range(2):
+        with pytest.raises(app_module.requests.ConnectionError):
+            app_module.tmdb_get('https://tmdb.test/3/movie/1')
+    assert len(tmdb.calls) == 2
+
+    with pytest.raises(app_module.requests.ConnectionError):
+        app_module.tmdb_get('https://tmdb.test/3/movie/1')
+    assert len(tmdb.calls) == 2
+    assert load(app_module, 'fallback', monkeypatch) == (SNAPSHOT, True)
+    assert len(tmdb.calls) == 2
@@ -0,0 +1,66 @@
+import pytest
+
+from App import Catalog, TitleIndex
+
+
+def catalog(entries, title_key, date_key):
+    """entries: (id, title, date, popularity)"""
+    ids, titles, dates, popularity = zip(*entries)
+    return Catalog(ids, titles, [''] * len(ids), dates, title_key, date_key, popularity)
+
+
+@pytest.fixture
+def index():
+    # Eleven identically named remakes, the most popular listed last, so a
+    # search that truncated before breaking ties would miss it
+    movies = [(n, 'The Thing', f'{1950 + n}-01-01', float(n)) for n in range(1, 12)]
+    movies += [(100, 'Heat', '1995-12-15', 40.0), (101, 'Heat', '1972-10-06', 2.0),
+               (102, 'Spider-Man: No Way Home', '2021-12-15', 90.0)]
+    shows = [(500, 'Heat', '2020-01-01', 5.0), (501, 'Breaking Bad', '2008-01-20', 80.0)]
+    return TitleIndex({'movie': catalog(movies, 'title', 'release_date'),
+                       'tv': catalog(shows, 'name', 'first_air_date')})
+
+
+def test_search_breaks_score_ties_by_popularity_before_limiting(index):
+    results = index.search('the thing', limit=3)
+    assert [(kind, row) for kind, row, _ in results] == [('movie', 10), ('movie', 9), ('movie', 8)]
+    assert all(score == 100 for _, _, score in results)
+
+
+def test_search_ranks_by_score_first(index):
+    results = index.search('heat', limit=10)
+    assert [(kind, row) for kind, row, _ in results][:3] == [('movie', 11), ('tv', 0), ('movie', 12)]
+    scores = [score for _, _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_normalises_the_query_and_applies_the_cutoff(index):
+    assert index.best('SPIDER-MAN no way home!')[:2] == ('movie', 13)
+    assert index.search('zzzzzz') == []
+    assert index.search('') == []
+    assert index.best(None) is None
+
+
+def test_match_many_exact_titles_use_year_then_popularity(index):
+    matches = index.match_many([
+        ('Heat', None, None),
+        ('heat', 'movie', '1972'),
+        ('Heat', 'tv', None),
+        ('The Thing', 'movie', 1955),
+        ('Breaking Bad', 'movie', None),
+        ('', None, None),
+    ])
+    assert matches[:4] == [('movie', 11), ('movie', 12), ('tv', 0), ('movie', 4)]
+    # Wrong kind hint: no exact hit, and fuzzy matching only looks at movies
+    assert matches[4] is None
+    assert matches[5] is None
+
+
+def test_match_many_fuzzy_matches_respect_kind_and_cutoff(index):
+    matches = index.match_many([
+        ('Breaking Bd', None, None),
+        ('Breaking Bd', 'movie', None),
+        ('The Thingg', 'movie', None),
+        ('Something else entirely', None, None),
+    ], chunk_size=2)
+    assert matches == [('tv', 1), None, ('movie', 10), None]
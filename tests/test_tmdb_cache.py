@@ -0,0 +1,84 @@
+from App import MISSING, Uncached, tmdb_cache, tmdb_cached
+
+
+def counted(results, **options):
+    """A tmdb_cached helper returning `results` in turn and counting calls"""
+    calls = []
+    results = list(results)
+
+    @tmdb_cached(**options)
+    def lookup(item_id, region='IN'):
+        calls.append((item_id, region))
+        return results.pop(0)
+    return lookup, calls
+
+
+def test_positional_keyword_and_default_arguments_share_one_key():
+    lookup, calls = counted([{'id': 1}])
+    assert lookup(1) == {'id': 1}
+    assert lookup(1, 'IN') == {'id': 1}
+    assert lookup(item_id=1, region='IN') == {'id': 1}
+    assert lookup(1, region='IN') == {'id': 1}
+    assert calls == [(1, 'IN')]
+    assert lookup.cache_key(1) == lookup.cache_key(item_id=1, region='IN') == 'lookup:1:IN'
+
+
+def test_different_arguments_get_different_entries():
+    lookup, calls = counted([{'id': 1}, {'id': 1, 'region': 'US'}])
+    lookup(1)
+    assert lookup(1, 'US') == {'id': 1, 'region': 'US'}
+    assert len(calls) == 2
+
+
+def test_invalidate_drops_only_that_entry():
+    lookup, calls = counted([{'v': 1}, {'v': 2}, {'v': 3}])
+    lookup(1)
+    lookup(2)
+    lookup.invalidate(item_id=1)
+    assert tmdb_cache.get('lookup:1:IN') is MISSING
+    assert lookup(1) == {'v': 3}
+    assert lookup(2) == {'v': 2}
+    assert calls == [(1, 'IN'), (2, 'IN'), (1, 'IN')]
+
+
+def test_empty_results_are_not_cached_by_default():
+    lookup, calls = counted([None, [], {'id': 1}])
+    assert lookup(1) is None
+    assert lookup(1) == []
+    assert lookup(1) == {'id': 1}
+    assert lookup(1) == {'id': 1}
+    assert len(calls) == 3
+
+
+def test_uncached_results_are_returned_but_not_stored():
+    lookup, calls = counted([Uncached(), None, 'ignored'], cache_if=lambda value: True)
+    # An upstream error: hand back None but ask again next time
+    assert lookup(1) is None
+    assert tmdb_cache.get('lookup:1:IN') is MISSING
+    # A successful "nothing here" answer is cached
+    assert lookup(1) is None
+    assert lookup(1) is None
+    assert len(calls) == 2
+
+
+def test_cache_read_failure_is_treated_as_a_miss(monkeypatch):
+    lookup, calls = counted([{'v': 1}, {'v': 2}])
+
+    def broken(key):
+        raise OSError('cache unavailable')
+    monkeypatch.setattr(tmdb_cache, 'get', broken)
+    assert lookup(1) == {'v': 1}
+    assert lookup(1) == {'v': 2}
+    assert len(calls) == 2
+
+
+def test_trailer_lookup_caches_no_trailer_but_not_errors(app_module, tmdb):
+    tmdb.route('/movie/7/videos', status_code=500)
+    assert app_module.get_movie_trailer(7) is None
+    assert app_module.get_movie_trailer(7) is None
+    assert len(tmdb.calls) == 2
+
+    tmdb.route('/movie/7/videos', {'results': [{'site': 'Vimeo', 'type': 'Trailer', 'key': 'x'}]})
+    assert app_module.get_movie_trailer(7) is None
+    assert app_module.get_movie_trailer(7) is None
+    assert len(tmdb.calls) == 3
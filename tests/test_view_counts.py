@@ -0,0 +1,92 @@
+import sqlite3
+import time
+
+import pytest
+
+from App import ViewCounter
+
+
+@pytest.fixture
+def counter(tmp_path):
+    return ViewCounter(str(tmp_path / 'views.db'))
+
+
+class FailingConnection:
+    """Wraps a sqlite3 connection so the batched insert fails once"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def executemany(self, *args):
+        if not self.failed:
+            self.failed = True
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.executemany(*args)
+
+
+def test_views_are_only_visible_after_a_flush(counter):
+    for item_id in (1, 1, 2, '1'):
+        counter.record('movie', item_id)
+    counter.record('tv', 1)
+    assert counter.top('movie') == []
+
+    counter.flush()
+    assert counter.top('movie') == [(1, 3), (2, 1)]
+    assert counter.top('tv') == [(1, 1)]
+    assert counter._pending == {}
+
+
+def test_flushes_add_to_the_stored_totals(counter):
+    counter.record('movie', 1)
+    counter.flush()
+    counter.record('movie', 1)
+    counter.record('movie', 2)
+    counter.flush()
+    counter.flush()  # nothing pending
+    assert counter.top('movie', limit=1) == [(1, 2)]
+
+
+def test_top_covers_only_the_requested_days(counter):
+    today = int(time.time() // 86400)
+    counter._connect().executemany("INSERT INTO views (kind, id, day, count) VALUES (?, ?, ?, ?)",
+                                   [('movie', 1, today - 3, 50), ('movie', 2, today, 5)])
+    assert counter.top('movie', days=1) == [(2, 5)]
+    assert counter.top('movie', days=7) == [(1, 50), (2, 5)]
+
+
+def test_failed_flush_keeps_the_counts_for_the_next_one(counter, monkeypatch):
+    conn = FailingConnection(counter._connect())
+    monkeypatch.setattr(counter, '_connect', lambda: conn)
+    counter.record('movie', 1)
+    counter.record('movie', 1)
+    counter.flush()
+    assert not conn.in_transaction
+    assert counter.top('movie') == []
+
+    # Views recorded meanwhile are merged with the re-queued ones
+    counter.record('movie', 1)
+    counter.flush()
+    assert counter.top('movie') == [(1, 3)]
+
+
+def test_old_days_are_pruned_on_flush(counter, app_module):
+    today = int(time.time() // 86400)
+    counter._connect().execute("INSERT INTO views (kind, id, day, count) VALUES ('movie', 1, ?, 9)",
+                               (today - app_module.VIEW_KEEP_DAYS - 1,))
+    counter.record('movie', 2)
+    counter.flush()
+    assert counter.top('movie', days=app_module.VIEW_KEEP_DAYS + 5) == [(2, 1)]
+
+
+def test_detail_page_views_are_counted(app_module, tmdb, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'view_counts', ViewCounter(app_module.VIEW_COUNTS_PATH + '.test'))
+    tmdb.route('/movie/101', {'id': 101, 'title': 'Movie 1', 'release_date': '2001-01-01', 'genres': [],
+                              'vote_average': 7, 'runtime': 90, 'overview': ''})
+    # The second and third come from the page cache and still count
+    for _ in range(3):
+        assert client.get('/movie/101').status_code == 200
+    app_module.view_counts.flush()
+    assert app_module.view_counts.top('movie') == [(101, 3)]
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+
+
+def add(client, item_type, item_id, title='Some title'):
+    return client.post('/add_to_watchlist', json={'item_type': item_type, 'item_id': item_id, 'title': title})
+
+
+def contains(client, *keys):
+    return client.post('/api/watchlist/contains', json={'items': list(keys)}).get_json()['items']
+
+
+def test_add_validates_input_and_rejects_duplicates(client, user):
+    assert add(client, 'movie', 'abc').status_code == 400
+    assert add(client, 'person', 101).status_code == 400
+    assert client.post('/add_to_watchlist', json={'item_type': 'movie', 'item_id': 101}).status_code == 400
+    assert client.post('/add_to_watchlist', data='not json').status_code == 400
+
+    assert add(client, 'movie', 101).get_json()['success']
+    duplicate = add(client, 'movie', '101').get_json()
+    assert not duplicate['success'] and duplicate['message'] == 'Already in your watchlist'
+
+
+def test_duplicate_check_does_not_trust_a_stale_membership_cache(app_module, client, user):
+    contains(client, 'movie:101')  # caches the empty set
+    # Written behind the cache's back, e.g. by a request that lost a race
+    app_module.db.session.add(app_module.WatchlistItem(user_id=user, item_id=101, item_type='movie', title='x'))
+    app_module.db.session.commit()
+    assert not add(client, 'movie', 101).get_json()['success']
+
+
+def test_contains_follows_adds_and_removes(client, user):
+    assert client.get('/api/watchlist/contains?items=movie:101').status_code == 200
+    assert contains(client, 'movie:101', 'tv:500', 'bogus') == {'movie:101': False, 'tv:500': False, 'bogus': False}
+    item_id = add(client, 'movie', 101).get_json()['id']
+    assert contains(client, 'movie:101', 'tv:500') == {'movie:101': True, 'tv:500': False}
+    assert client.post('/remove_from_watchlist', json={'watchlist_item_id': item_id}).get_json()['success']
+    assert contains(client, 'movie:101') == {'movie:101': False}
+
+
+def test_contains_requires_login(client, db):
+    assert client.post('/api/watchlist/contains', json={'items': ['movie:101']}).status_code == 401
+
+
+def test_contains_limits_batch_size(app_module, client, user):
+    keys = [f'movie:{n}' for n in range(app_module.WATCHLIST_CONTAINS_MAX + 1)]
+    assert client.post('/api/watchlist/contains', json={'items': keys}).status_code == 400
+
+
+def test_import_resolves_titles_and_skips_duplicates(client, user):
+    add(client, 'movie', 103)
+    upload = io.BytesIO(
+        b'title,item_type,item_id,year\n'
+        b'Movie 2,,,\n'           # matched by title
+        b'show 4,tv,,2004\n'     # normalised title, kind hint
+        b',movie,103,\n'         # already listed
+        b'Mystery,movie,999999,\n'  # unknown id but has a title: kept as given
+        b'Nothing like it at all,,,\n'
+    )
+    result = client.post('/watchlist/import', data={'file': (upload, 'list.csv')}).get_json()
+    assert result['success']
+    assert (result['imported'], result['already_listed'], result['unresolved']) == (3, 1, 1)
+    assert result['unresolved_sample'][0]['title'] == 'Nothing like it at all'
+    assert contains(client, 'movie:102', 'tv:504', 'movie:999999') == \
+        {'movie:102': True, 'tv:504': True, 'movie:999999': True}
+
+
+def test_export_import_round_trip(client, user, app_module):
+    add(client, 'movie', 101, 'Movie 1')
+    add(client, 'tv', 505, 'Show 5')
+    add(client, 'movie', 424242, 'Not in the catalog')
+
+    for export_format in ('csv', 'jsonl'):
+        response = client.get(f'/watchlist/export?format={export_format}')
+        assert response.status_code == 200
+        assert 'no-store' in response.headers['Cache-Control']
+        body = response.get_data(as_text=True)
+        if export_format == 'csv':
+            records = list(csv.DictReader(io.StringIO(body)))
+        else:
+            records = [json.loads(line) for line in body.splitlines()]
+        assert {(r['item_type'], int(r['item_id']), r['title']) for r in records} == \
+            {('movie', 101, 'Movie 1'), ('tv', 505, 'Show 5'), ('movie', 424242, 'Not in the catalog')}
+
+        # Into an empty watchlist, then again on top of itself
+        app_module.WatchlistItem.query.delete()
+        app_module.db.session.commit()
+        app_module.invalidate_watchlist_membership(user)
+        upload = (io.BytesIO(body.encode()), f'watchlist.{export_format}')
+        result = client.post('/watchlist/import', data={'file': upload}).get_json()
+        assert (result['imported'], result['already_listed'], result['unresolved']) == (3, 0, 0)
+        upload = (io.BytesIO(body.encode()), f'watchlist.{export_format}')
+        result = client.post('/watchlist/import', data={'file': upload}).get_json()
+        assert (result['imported'], result['already_listed']) == (0, 3)
+
+
+def test_import_rejects_unknown_formats_and_bad_encodings(client, user):
+    assert client.post('/watchlist/import?format=xml', data=b'').status_code == 400
+    response = client.post('/watchlist/import', data={'file': (io.BytesIO(b'title\n\xff\xfe\n'), 'list.csv')})
+    assert response.status_code == 400
+
+
+def test_a_cache_outage_never_fails_a_committed_write(app_module, client, user, broken_cache):
+    response = add(client, 'movie', 101)
+    assert response.status_code == 200 and response.get_json()['success']
+    assert contains(client, 'movie:101') == {'movie:101': True}
+    assert not add(client, 'movie', 101).get_json()['success']
+
+    upload = (io.BytesIO(b'title\nMovie 2\n'), 'list.csv')
+    response = client.post('/watchlist/import', data={'file': upload})
+    assert response.status_code == 200 and response.get_json()['imported'] == 1
+
+    item_id = app_module.WatchlistItem.query.filter_by(item_id=101).one().id
+    assert client.post('/remove_from_watchlist', json={'watchlist_item_id': item_id}).get_json()['success']
+    assert contains(client, 'movie:101', 'movie:102') == {'movie:101': False, 'movie:102': True}